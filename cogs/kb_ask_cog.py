@@ -1,6 +1,7 @@
 import discord
 import os
 import time
+import asyncio
 import random
 import hashlib
 import datetime
@@ -9,7 +10,7 @@ from discord.commands import option
 from dotenv import load_dotenv
 
 from utils import gsheet_utils
-from utils.ask_utils import categorize_question, load_specified_ask_sheet, load_all_ask_sheets, get_responses_for_role, get_substring_response
+from utils.ask_utils import categorize_question, load_category_matcher, load_specified_ask_sheet, load_all_ask_sheets, get_responses_for_role, get_substring_response
 
 REFRESH_ASK_COOLDOWN_SECONDS = 60
 
@@ -17,11 +18,21 @@ class AskCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.refresh_ask_cooldown = 0
+        self.initial_refresh_started = False
         self.sheet_name = os.environ.get("ASK_SHEET_NAME")
         if not self.sheet_name:
             raise RuntimeError("ASK_SHEET_NAME not found in environment variables!")
+        # Serve from the last local snapshot until the first fetch from Google lands
+        gsheet_utils.load_snapshot()
         print("✅ AskCog loaded!")
 
+    @commands.Cog.listener()
+    async def on_ready(self):
+        if self.initial_refresh_started:
+            return
+        self.initial_refresh_started = True
+        asyncio.create_task(load_all_ask_sheets(self.sheet_name))
+
     @discord.slash_command(name="hello", description="Say hello to kringbot")
     async def hello(self, ctx: discord.ApplicationContext):
         defaultResponses = [
@@ -32,7 +43,7 @@ class AskCog(commands.Cog):
         ]
         username = ctx.author.name   # This is the real username, not display/nickname
         roles = [role.name for role in ctx.author.roles]
-        responses = get_responses_for_role(self.sheet_name, roles, "hello", username=username)
+        responses = await get_responses_for_role(self.sheet_name, roles, "hello", username=username)
         if not responses:
             response = random.choice(defaultResponses)
         else:
@@ -52,9 +63,9 @@ class AskCog(commands.Cog):
 
             if time_since_last > REFRESH_ASK_COOLDOWN_SECONDS:
                 if cache_name.lower().strip() == "all":
-                    load_all_ask_sheets(self.sheet_name)
+                    await load_all_ask_sheets(self.sheet_name)
                 else:
-                    load_specified_ask_sheet(self.sheet_name, cache_name.lower(), force=True)
+                    await load_specified_ask_sheet(self.sheet_name, cache_name.lower(), force=True)
                 self.refresh_ask_cooldown = now
                 await ctx.respond(f"📝 Refreshed {cache_name} cache!")
             else:
@@ -77,26 +88,26 @@ class AskCog(commands.Cog):
             role_names = [role.name for role in ctx.author.roles]
 
             # Special response
-            special_responses = load_specified_ask_sheet(self.sheet_name, "specials")
+            special_responses = await load_specified_ask_sheet(self.sheet_name, "specials")
             if special_responses and question.strip() in special_responses:
                 response = special_responses[question.strip()][0].replace("{user}", display_name)
                 await ctx.respond(f"**{display_name} asks**: {question}\n**Kringbot says**: {response}")
                 return
 
             # Role-specific response
-            response = get_substring_response(self.sheet_name, ctx.author.name, role_names, question)
+            response = await get_substring_response(self.sheet_name, ctx.author.name, role_names, question)
             if response:
                 response = response.replace("{user}", display_name)
                 await ctx.respond(f"**{display_name} asks**: {question}\n**Kringbot says**: {response}")
                 return
 
-            category_keywords = load_specified_ask_sheet(self.sheet_name, "categories")
-            responses_by_category = load_specified_ask_sheet(self.sheet_name, "responses")
-            if not category_keywords or not responses_by_category:
+            category_matcher = await load_category_matcher(self.sheet_name)
+            responses_by_category = await load_specified_ask_sheet(self.sheet_name, "responses")
+            if not category_matcher.categories or not responses_by_category:
                 await ctx.respond("⚠️ UmU I couldn't load my response data. Try `/refresh-ask` or contact the dev.")
                 return
 
-            category = categorize_question(question, category_keywords)
+            category = categorize_question(question, category_matcher)
             responses = responses_by_category.get(category, responses_by_category["general"])
 
             now = datetime.datetime.now(datetime.UTC)
@@ -121,8 +132,9 @@ class AskCog(commands.Cog):
     async def show_ask_cache(self, ctx: discord.ApplicationContext, cache_name: str):
         try:
             await ctx.defer(ephemeral=True)
-            cache = load_specified_ask_sheet(self.sheet_name, cache_name.lower())
+            cache = await load_specified_ask_sheet(self.sheet_name, cache_name.lower())
             print(f"{cache_name}: {cache}")
+            print(f"{cache_name} stats: {gsheet_utils.get_cache_stats(self.sheet_name, cache_name.lower())}")
             await ctx.respond("✅ Cache printed to console.")
         except discord.errors.NotFound:
             print("❌ Interaction expired before response could be sent.")
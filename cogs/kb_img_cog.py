@@ -1,11 +1,27 @@
 import discord
 import time
 import os
-from discord.ext import commands
-from discord.commands import slash_command
-from utils import gimg_utils, bot_prefs
+import io
+from discord.ext import commands, tasks
+from discord.commands import slash_command, Option
+from utils import gimg_utils, gsheet_utils, bot_prefs
 
 REFRESH_IMG_COOLDOWN_SECONDS = 300
+IMAGE_SYNC_INTERVAL_SECONDS = 60
+
+# IMAGE_DELIVERY_MODE=attachment sends images as uploads from a local cache instead of Drive links
+IMAGE_DELIVERY_MODE = os.environ.get("IMAGE_DELIVERY_MODE", "link").lower()
+IMAGE_CACHE_DIR = os.environ.get("IMAGE_CACHE_DIR", "image_cache")
+IMAGE_CACHE_MAX_MB = int(os.environ.get("IMAGE_CACHE_MAX_MB", 512))
+IMAGE_PREFETCH_COUNT = 20
+# Embed size tier for linked images: small / medium / large / original (see gimg_utils.IMAGE_SIZE_TIERS)
+IMAGE_EMBED_SIZE = os.environ.get("IMAGE_EMBED_SIZE", "original").lower()
+
+# Rarity tiers, e.g. IMAGE_TIER_FOLDERS="kring common:10,kring rare:3,kring legendary:1".
+# Per-image weights can also come from the "image_weights" tab (name | weight) of IMAGE_WEIGHTS_SHEET_NAME.
+IMAGE_TIER_FOLDERS = os.environ.get("IMAGE_TIER_FOLDERS", "")
+IMAGE_WEIGHTS_SHEET_NAME = os.environ.get("IMAGE_WEIGHTS_SHEET_NAME")
+IMAGE_NO_REPEAT_WINDOW = int(os.environ.get("IMAGE_NO_REPEAT_WINDOW", 0))  # 0 = off
 DAILY_COOLDOWN_SECONDS = 60 * 60 * 12
 KRINGPIC_COOLDOWN_SECONDS = 65
 
@@ -16,12 +32,95 @@ class ImgCog(commands.Cog):
         self.img_folder_name = os.environ.get("DAILY_IMAGE_FOLDER_ID")
         if not self.img_folder_name:
             raise RuntimeError("DAILY_IMAGE_FOLDER_ID not found in environment variables!")
+        if IMAGE_DELIVERY_MODE == "attachment":
+            gimg_utils.enable_disk_cache(IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_MB * 1024 * 1024)
+
+        folder_weights = {}
+        for tier in filter(None, IMAGE_TIER_FOLDERS.split(",")):
+            folder_name, _, weight = tier.rpartition(":")
+            folder_name = folder_name.strip()
+            try:
+                weight = float(weight)
+            except ValueError:
+                weight = None
+            if not folder_name or weight is None or not weight > 0:
+                print(f"[ImgCog] ⚠️ Skipping malformed IMAGE_TIER_FOLDERS entry {tier!r} (expected 'folder name:weight')")
+                continue
+            folder_weights[folder_name] = weight
+        self.image_pool = gimg_utils.WeightedImagePool(
+            folder_weights or {self.img_folder_name: 1},
+            no_repeat_window=IMAGE_NO_REPEAT_WINDOW
+        )
+        self.image_weights_table = None
         print("✅ ImgCog loaded!")
 
+    async def pick_image(self, user_id: int):
+        """Weighted random image for a user, honouring tier/sheet weights and the no-repeat window."""
+        if IMAGE_WEIGHTS_SHEET_NAME:
+            table = await gsheet_utils.try_get_from_cache_async(IMAGE_WEIGHTS_SHEET_NAME, "image_weights")
+            if table is not self.image_weights_table:
+                weights = {}
+                for name, values in table.items():
+                    try:
+                        weights[name] = float(values[0])
+                    except (IndexError, ValueError):
+                        continue
+                self.image_pool.set_image_weights(weights)
+                self.image_weights_table = table
+        return await self.image_pool.pick(user_id)
+
+    def cog_unload(self):
+        self.sync_images.cancel()
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        if not self.sync_images.is_running():
+            self.sync_images.start()
+
+    @tasks.loop(seconds=IMAGE_SYNC_INTERVAL_SECONDS)
+    async def sync_images(self):
+        """Pull folder additions, removals and renames from the Drive changes feed."""
+        try:
+            applied = await gimg_utils.sync_image_changes()
+            if applied:
+                print(f"[ImgCog] 🔄 Synced {applied} image change(s) from Drive.")
+            if gimg_utils.disk_cache_enabled():
+                # Warm the pool's next picks, then re-warm popular images that got evicted
+                await gimg_utils.prefetch_images(await self.image_pool.upcoming(IMAGE_PREFETCH_COUNT))
+                await gimg_utils.prefetch_popular_images(IMAGE_PREFETCH_COUNT)
+        except Exception as e:
+            print(f"❗ Unexpected error while syncing images: {e}")
+
+    async def respond_with_image(self, ctx, embed: discord.Embed, image: dict):
+        """Send `image` in `embed`, as an uploaded attachment when the disk cache is on, else as a Drive link."""
+        if gimg_utils.disk_cache_enabled():
+            try:
+                data = await gimg_utils.get_image_bytes(image)
+                extension = os.path.splitext(image.get("name", ""))[1].lower() or ".png"
+                filename = f"kringle{extension}"
+                embed.set_image(url=f"attachment://{filename}")
+                await ctx.respond(embed=embed, file=discord.File(io.BytesIO(data), filename=filename))
+                return
+            except Exception as e:
+                print(f"[ImgCog] ⚠️ Falling back to Drive link for {image.get('id')}: {e}")
+
+        embed.set_image(url=await gimg_utils.sized_image_url(image, IMAGE_EMBED_SIZE))
+        await ctx.respond(embed=embed)
+
     @discord.slash_command(name="refresh-images", description="Reload images from the Kringbot Daily Google Drive folder.")
-    async def refresh_images(self, ctx):
+    async def refresh_images(
+        self,
+        ctx,
+        full: Option(bool, description="Re-list the whole folder instead of syncing recent changes", default=False)
+    ):
         try:
             await ctx.defer(ephemeral=True)
+            if not full:
+                # Incremental sync is cheap, so it isn't rate-limited
+                applied = await gimg_utils.sync_image_changes()
+                await ctx.respond(f"✅ Image list synced ({applied} change(s)).")
+                return
+
             now = time.time()
             time_since_last = now - self.refresh_img_cooldown
             time_left = REFRESH_IMG_COOLDOWN_SECONDS - time_since_last
@@ -32,7 +131,7 @@ class ImgCog(commands.Cog):
                 await ctx.respond(f"⏳ A refresh was done recently! Try again in {minutes}m {seconds}s.")
                 return
 
-            success = gimg_utils.refresh_folder_cache(self.img_folder_name)
+            success = await gimg_utils.refresh_folder_cache(self.img_folder_name)
 
             if success:
                 self.refresh_img_cooldown = now
@@ -59,17 +158,15 @@ class ImgCog(commands.Cog):
                     await ctx.respond(f"⏳ You've already received your image of the day! Try again in {hours}h {minutes}m {seconds}s.")
                     return
 
-            image_url = gimg_utils.get_random_image_url(self.img_folder_name)
-            if not image_url:
+            image = await self.pick_image(user_id)
+            if not image:
                 await ctx.respond("⚠️ UmU Could not find images in the daily folder. Try contacting the dev.")
                 return
             # Set cooldown for this user
             if not no_cd:
                 bot_prefs.set(f"daily_img_cd_{user_id}", DAILY_COOLDOWN_SECONDS, time_based=True)
             embed = discord.Embed(title=f"🖼️ Here's your image of the day, {ctx.author.display_name}!")
-            embed.set_image(url=image_url)
-
-            await ctx.respond(embed=embed)
+            await self.respond_with_image(ctx, embed, image)
         except discord.errors.NotFound:
             print("❌ Interaction expired before response could be sent.")
         except Exception as e:
@@ -89,17 +186,15 @@ class ImgCog(commands.Cog):
                     await ctx.respond(f"⏳ You've recently requested a kringpic! Try again in {minutes}m {seconds}s.")
                     return
 
-            image_url = gimg_utils.get_random_image_url(self.img_folder_name)
-            if not image_url:
+            image = await self.pick_image(user_id)
+            if not image:
                 await ctx.respond("⚠️ UmU Could not find images in the images folder. Try contacting the dev.")
                 return
             # Set cooldown for this user
             if not no_cd: 
                 bot_prefs.set(f"kringpic_img_cd_{user_id}", KRINGPIC_COOLDOWN_SECONDS, time_based=True)
             embed = discord.Embed(title=f"🖼️ Here's a kring pic, {ctx.author.display_name}!")
-            embed.set_image(url=image_url)
-
-            await ctx.respond(embed=embed)
+            await self.respond_with_image(ctx, embed, image)
         except discord.errors.NotFound:
             print("❌ Interaction expired before response could be sent.")
         except Exception as e:
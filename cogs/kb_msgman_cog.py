@@ -3,57 +3,13 @@ import time
 from discord.ext import commands
 from collections import OrderedDict, defaultdict
 from utils import bot_prefs
+from utils.paginator import BasePaginator
 
 MAX_TRACKED_MESSAGES = 256
 MAX_DELETED_PER_USER = 32
 MAX_EDITED_PER_USER = 32
 MAX_EDITS_PER_MESSAGE = 8
 
-class BasePaginator(discord.ui.View):
-    def __init__(self, pages, author_id, title_prefix="Messages", emoji="", color=discord.Color.blurple()):
-        super().__init__(timeout=120)
-        self.pages = pages
-        self.current = 0
-        self.author_id = author_id
-        self.title_prefix = title_prefix
-        self.emoji = emoji
-        self.color = color
-        self.update_buttons()
-
-    def update_buttons(self):
-        self.children[0].disabled = self.current == 0
-        self.children[1].disabled = self.current >= len(self.pages) - 1
-
-    @discord.ui.button(label="⬅️ Previous", style=discord.ButtonStyle.primary)
-    async def go_prev(self, button, interaction):
-        if interaction.user.id != self.author_id:
-            return await interaction.response.send_message("Not your command!", ephemeral=True)
-        self.current -= 1
-        self.update_buttons()
-        await interaction.response.edit_message(embed=self.make_embed(), view=self)
-
-    @discord.ui.button(label="Next ➡️", style=discord.ButtonStyle.primary)
-    async def go_next(self, button, interaction):
-        if interaction.user.id != self.author_id:
-            return await interaction.response.send_message("Not your command!", ephemeral=True)
-        self.current += 1
-        self.update_buttons()
-        await interaction.response.edit_message(embed=self.make_embed(), view=self)
-
-    @discord.ui.button(label="❌ Close", style=discord.ButtonStyle.danger, row=1)
-    async def close(self, button, interaction):
-        await interaction.message.delete()
-
-    def make_embed(self):
-        return discord.Embed(
-            title=f"{self.emoji} {self.title_prefix} (Page {self.current+1}/{len(self.pages)})",
-            description=self.pages[self.current],
-            color=self.color
-        )
-
-    async def interaction_check(self, interaction):
-        return interaction.user.id == self.author_id
-
 class MessageManager(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
@@ -249,7 +205,7 @@ class MessageManager(commands.Cog):
                     entry["message_id"],
                     entry["channel"],
                     entry["original"],
-                    entry["edits"]
+                    list(entry["edits"])  # on_message_edit keeps appending to the live list
                 ))
 
         bot_prefs.set(f"{guild_id}_edited", all_edits)
@@ -266,7 +222,7 @@ class MessageManager(commands.Cog):
                 "message_id": msg_id,
                 "channel": channel,
                 "original": original,
-                "edits": edits
+                "edits": list(edits)  # the stored list stays untouched by later edits
             })
         if len(deleted) > 0 and len(edited) > 0:
             print(f"[Restore] ✅ Restored logs for guild {guild.name} ({gid})")
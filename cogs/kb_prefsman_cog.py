@@ -1,45 +1,218 @@
 import discord
 import atexit
+import asyncio
 import os
-from discord.ext import commands
+from concurrent.futures import ThreadPoolExecutor
+from discord.ext import commands, tasks
 from utils import bot_prefs, drive_prefs
 
-LOCAL_PREF_PATH = "kringbot_prefs.json"
+# Compact snapshot (see utils/prefs_codec); the pretty-printed JSON it replaces is still read once to migrate
+LOCAL_PREF_PATH = "kringbot_prefs.kbp"
+LEGACY_PREF_PATH = "kringbot_prefs.json"
+# Append every write to "kringbot_prefs.kbp.log" instead of relying on full saves alone
+PREFS_JOURNAL_ENABLED = os.environ.get("PREFS_JOURNAL", "1") != "0"
+# Background persistence: local snapshot at most every N seconds, Drive on a longer interval
+PREFS_FLUSH_INTERVAL_SECONDS = int(os.environ.get("PREFS_FLUSH_INTERVAL_SECONDS", 30))
+PREFS_DRIVE_SYNC_INTERVAL_MINUTES = int(os.environ.get("PREFS_DRIVE_SYNC_INTERVAL_MINUTES", 15))
+# "json" (in-memory store + snapshot file) or "sqlite" (database at PREFS_DB_PATH, snapshot kept for Drive backups)
+PREFS_BACKEND = os.environ.get("PREFS_BACKEND", "json").lower()
+PREFS_DB_PATH = os.environ.get("PREFS_DB_PATH", "kringbot_prefs.db")
+SQLITE_FLUSH_INTERVAL_SECONDS = 2
+EXPIRY_SWEEP_INTERVAL_SECONDS = 30
+
+_active_manager = None  # The loaded PrefsManager, whose persist worker the exit save runs on
 
 def _save_prefs():
-    if not bot_prefs.all_keys():
-        print("[PrefsManager] 💤 No prefs to save — skipping Drive upload.")
+    manager = _active_manager
+    if manager is None or not manager.prefs_loaded:
+        print("[PrefsManager] 💤 Prefs were never loaded — skipping exit save.")
         return
-    
-    bot_prefs.save(LOCAL_PREF_PATH)
-    drive_prefs.upload_to_drive(LOCAL_PREF_PATH)
-    print("[PrefsManager] 🧷 Saved prefs via atexit.")
+    try:
+        # Queue behind any save/compaction still on the persist worker, so the two can never interleave
+        manager.persist_executor.submit(manager.save_on_exit).result()
+    except RuntimeError:
+        # The worker pool is already shut down (interpreter exit joins it first), so nothing is in flight
+        manager.save_on_exit()
 
 atexit.register(_save_prefs)
 
+def _has_local_prefs(path):
+    """A snapshot or any journal segment for it exists on disk."""
+    return any(os.path.exists(path + suffix) for suffix in ("", bot_prefs.JOURNAL_SUFFIX, bot_prefs.ROTATED_JOURNAL_SUFFIX))
+
 class PrefsManager(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.prefs_loaded = False
+
+        # Persistence runs on one worker thread so saves and uploads never overlap or block the loop
+        self.persist_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefs-persist")
+        self.persist_lock = asyncio.Lock()
+        self.saved_version = None     # bot_prefs.write_version() covered by the local snapshot
+        self.uploaded_version = None  # ... and by the copy on Drive
+
+        global _active_manager
+        _active_manager = self
+
+    def cog_unload(self):
+        self.autosave.cancel()
+        self.drive_sync.cancel()
+        self.flush_writes.cancel()
+        self.sweep_expired.cancel()
+
+    async def _run_persist(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.persist_executor, func, *args)
+
+    async def flush_local(self, force=False):
+        """
+        Write the local snapshot if anything changed since the last one. Unless forced, this is skipped while
+        the writes are already durable elsewhere (a journal that doesn't need compacting yet, or SQLite).
+        """
+        async with self.persist_lock:
+            version = bot_prefs.write_version()
+            if version == self.saved_version:
+                return True
+            if not force and (bot_prefs.using_sqlite() or (bot_prefs.journaling() and not bot_prefs.journal_needs_compaction())):
+                return True
+
+            # Bursts of writes since the last flush all land in this one save
+            job = bot_prefs.prepare_save(LOCAL_PREF_PATH)
+            if await self._run_persist(job):
+                self.saved_version = version
+                return True
+            return False
+
+    async def push_to_drive(self):
+        """Snapshot (if needed) and upload to Drive, unless Drive already has the latest state."""
+        if not await self.flush_local(force=True):
+            return
+        async with self.persist_lock:
+            version = self.saved_version
+            if version == self.uploaded_version:
+                return
+            if not bot_prefs.all_keys():
+                print("[PrefsManager] 💤 No prefs to save — skipping Drive upload.")
+                return
+            try:
+                await self._run_persist(drive_prefs.upload_to_drive, LOCAL_PREF_PATH)
+                self.uploaded_version = version
+            except Exception as e:
+                print(f"[PrefsManager] ❗ Drive upload failed: {e}")
+
+    def save_on_exit(self):
+        """
+        Last save at interpreter exit (blocking; meant for the persist worker). The full snapshot is skipped
+        when writes are already durable (journal not due for compaction, or SQLite once flushed).
+        """
+        try:
+            if bot_prefs.using_sqlite():
+                bot_prefs.flush()
+            elif not (bot_prefs.journaling() and not bot_prefs.journal_needs_compaction()):
+                version = bot_prefs.write_version()
+                if version != self.saved_version and bot_prefs.save(LOCAL_PREF_PATH):
+                    self.saved_version = version
+
+            if self.saved_version == self.uploaded_version or not bot_prefs.all_keys() or not os.path.exists(LOCAL_PREF_PATH):
+                return
+            drive_prefs.upload_to_drive(LOCAL_PREF_PATH)
+            self.uploaded_version = self.saved_version
+            print("[PrefsManager] 🧷 Saved prefs via atexit.")
+        except Exception as e:
+            print(f"[PrefsManager] ❗ Exit save failed: {e}")
+
+    @tasks.loop(seconds=PREFS_FLUSH_INTERVAL_SECONDS)
+    async def autosave(self):
+        try:
+            await self.flush_local()
+        except Exception as e:
+            print(f"[PrefsManager] ❗ Autosave failed: {e}")
+
+    @tasks.loop(minutes=PREFS_DRIVE_SYNC_INTERVAL_MINUTES)
+    async def drive_sync(self):
+        try:
+            await self.push_to_drive()
+        except Exception as e:
+            print(f"[PrefsManager] ❗ Drive sync failed: {e}")
+
+    @tasks.loop(seconds=SQLITE_FLUSH_INTERVAL_SECONDS)
+    async def flush_writes(self):
+        try:
+            await self._run_persist(bot_prefs.flush)
+        except Exception as e:
+            print(f"[PrefsManager] ❗ Failed to commit prefs: {e}")
+
+    @tasks.loop(seconds=EXPIRY_SWEEP_INTERVAL_SECONDS)
+    async def sweep_expired(self):
+        # Evict finished cooldowns in batches, yielding to the loop between them
+        evicted = 0
+        while True:
+            batch = bot_prefs.sweep_expired(bot_prefs.SWEEP_BATCH_SIZE)
+            evicted += batch
+            if batch < bot_prefs.SWEEP_BATCH_SIZE:
+                break
+            await asyncio.sleep(0)
+        if evicted:
+            print(f"[PrefsManager] 🧹 Evicted {evicted} expired time-based prefs.")
+
+    def _start_loops(self):
+        for loop in (self.autosave, self.drive_sync, self.sweep_expired):
+            if not loop.is_running():
+                loop.start()
+        if bot_prefs.using_sqlite() and not self.flush_writes.is_running():
+            self.flush_writes.start()
 
     @commands.Cog.listener()
     async def on_ready(self):
-        # Load from Drive on first ready
-        if os.path.exists(LOCAL_PREF_PATH):
+        # on_ready fires again after reconnects; the in-memory store is already current by then
+        if self.prefs_loaded:
+            return
+        self.prefs_loaded = True
+
+        migrate = False
+        if PREFS_BACKEND == "sqlite" and bot_prefs.use_sqlite(PREFS_DB_PATH):
+            print("[PrefsManager] ✅ Loaded preferences from SQLite.")
+        # Otherwise load from a local snapshot/journal or Drive (into a fresh database, on the SQLite backend)
+        elif _has_local_prefs(LOCAL_PREF_PATH):
             bot_prefs.load(LOCAL_PREF_PATH)
             print("[PrefsManager] ✅ Loaded local preferences.")
+        elif _has_local_prefs(LEGACY_PREF_PATH):
+            bot_prefs.load(LEGACY_PREF_PATH)
+            migrate = True
+            print("[PrefsManager] ✅ Loaded legacy local preferences.")
         elif drive_prefs.download_from_drive(LOCAL_PREF_PATH):
             bot_prefs.load(LOCAL_PREF_PATH)
+            self.uploaded_version = bot_prefs.write_version()
             print("[PrefsManager] ✅ No local pref found. Loaded cloud preferences.")
+        elif drive_prefs.download_from_drive(LEGACY_PREF_PATH, drive_prefs.LEGACY_PREFS_FILENAME):
+            bot_prefs.load(LEGACY_PREF_PATH)
+            migrate = True
+            print("[PrefsManager] ✅ No local pref found. Loaded legacy cloud preferences.")
         else:
             print("[PrefsManager] ⚠️ No local or remote prefs found. Starting fresh.")
 
+        if PREFS_JOURNAL_ENABLED and not bot_prefs.using_sqlite():
+            bot_prefs.enable_journal(LOCAL_PREF_PATH)
+
+        # What was just loaded is already on disk; unless it came from Drive, the first sync uploads it once
+        self.saved_version = bot_prefs.write_version()
+        if migrate:
+            # Write the compact snapshot now; the legacy JSON stays behind untouched, its journal is folded in
+            self.saved_version = None
+            if await self.flush_local(force=True):
+                for suffix in (bot_prefs.JOURNAL_SUFFIX, bot_prefs.ROTATED_JOURNAL_SUFFIX):
+                    if os.path.exists(LEGACY_PREF_PATH + suffix):
+                        os.remove(LEGACY_PREF_PATH + suffix)
+                print(f"[PrefsManager] 🔁 Migrated {LEGACY_PREF_PATH} to {LOCAL_PREF_PATH}.")
+        self._start_loops()
+
     @commands.Cog.listener()
     async def on_disconnect(self):
-        _save_prefs()
+        # Fires on every gateway reconnect, so only flush locally (off the loop) if something changed
+        await self.flush_local()
 
     @commands.Cog.listener()
     async def on_close(self):
-        _save_prefs()
+        await self.push_to_drive()
 
     # @discord.slash_command(name="save-db", escription="Save current bot prefs to Drive")
     # async def save_db(self, ctx):
@@ -3,6 +3,8 @@ import random
 from discord.ext import commands
 from discord.commands import slash_command, Option, SlashCommandGroup
 from utils import bot_prefs
+from utils.paginator import BasePaginator
+from utils.rank_index import RankIndex
 
 # How often a user can claim a token (in seconds)
 CLAIM_COOLDOWN = 3600  # 1 hour
@@ -12,26 +14,62 @@ SECONDS_PER_TOKEN = 1
 
 CLAIM_TOKEN_NUM = 1000
 
+LEADERBOARD_PAGE_SIZE = 10
+
 class TokenCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        # Same "ktoken_balance_{user_id}" / "ktoken_claim_cd_{user_id}" keys, as indexed namespaces
+        self.balances = bot_prefs.table("ktoken_balance")
+        self.claim_cooldowns = bot_prefs.table("ktoken_claim_cd")
+        # Balance ranking, built from the table on first use and then kept current by the table's write hook,
+        # so writes from anywhere (other cogs, transactions, sweeps) are reflected; a store reload drops it
+        self._rank_index = None
+        self.balances.subscribe(self._on_balance_write)
         print("✅ TokenCog loaded!")
 
+    def get_rank_index(self) -> RankIndex:
+        if self._rank_index is None:
+            self._rank_index = RankIndex((user_id, int(balance)) for user_id, balance in self.balances.items())
+        return self._rank_index
+
+    def _on_balance_write(self, user_id, balance):
+        if user_id is None:
+            self._rank_index = None  # Store reloaded: rebuild on next use
+        elif self._rank_index is not None:
+            self._rank_index.update(user_id, int(balance or 0))
+
+    def cog_unload(self):
+        self.balances.unsubscribe(self._on_balance_write)
+
     def get_balance(self, user_id: int) -> int:
         """Returns how many tokens the user currently has."""
-        return int(bot_prefs.get(f"ktoken_balance_{user_id}", 0))
+        return int(self.balances.get(user_id, 0))
     
     def set_balance(self, user_id: int, new_balance: int):
         """Set the user's new token balance."""
-        bot_prefs.set(f"ktoken_balance_{user_id}", max(new_balance, 0))
+        self.balances.set(user_id, max(new_balance, 0))
+
+    # The helpers below read and write the balance in one step (see bot_prefs atomic operations),
+    # so concurrent button presses can't lose updates or spend the same tokens twice.
+    def add_tokens(self, user_id: int, amount: int) -> int:
+        """Add (or with a negative amount, remove) tokens, never going below 0. Returns the new balance."""
+        return int(self.balances.incr(user_id, amount, floor=0))
+
+    def try_spend(self, user_id: int, amount: int):
+        """Deduct `amount` if the user has that many tokens. Returns the new balance, or None if they don't."""
+        new_balance = self.balances.decr_if_at_least(user_id, amount)
+        if new_balance is None:
+            return None
+        return int(new_balance)
     
     def get_claim_cooldown_remaining(self, user_id: int) -> int:
         """Returns how many seconds remain before user can claim again."""
-        return int(bot_prefs.get(f"ktoken_claim_cd_{user_id}", 0))
+        return int(self.claim_cooldowns.get(user_id, 0))
 
     def set_claim_cooldown(self, user_id: int, seconds: int):
         """Sets the claim cooldown for a user to 'seconds' time-based."""
-        bot_prefs.set(f"ktoken_claim_cd_{user_id}", seconds, time_based=True)
+        self.claim_cooldowns.set(user_id, seconds, time_based=True)
 
     def modify_cooldown(self, cooldown_type: str, target_id: int, delta_seconds: int):
         """
@@ -81,12 +119,11 @@ class TokenCog(commands.Cog):
             )
 
         # Award 1 token
-        balance = self.get_balance(user_id)
-        self.set_balance(user_id, balance + CLAIM_TOKEN_NUM)
+        new_balance = self.add_tokens(user_id, CLAIM_TOKEN_NUM)
         # Set claim cooldown
         self.set_claim_cooldown(user_id, CLAIM_COOLDOWN)
 
-        await ctx.respond(f"✅ You have claimed your ktokens! Your new balance: {balance+ CLAIM_TOKEN_NUM}", ephemeral=True)
+        await ctx.respond(f"✅ You have claimed your ktokens! Your new balance: {new_balance}", ephemeral=True)
 
     @ktokengrp.command(name="balance", description="Check your token balance")
     async def balance(self, ctx: discord.ApplicationContext):
@@ -94,6 +131,32 @@ class TokenCog(commands.Cog):
         bal = self.get_balance(user_id)
         await ctx.respond(f"**{ctx.author.display_name}**: You have **{bal}** ktokens.", ephemeral=True)
 
+    @ktokengrp.command(name="leaderboard", description="See who holds the most ktokens")
+    async def leaderboard(self, ctx: discord.ApplicationContext):
+        index = self.get_rank_index()
+        if not len(index):
+            return await ctx.respond("Nobody has any ktokens yet!", ephemeral=True)
+
+        view = LeaderboardView(index, ctx.author.id)
+        await ctx.respond(embed=view.make_embed(), view=view)
+
+    @ktokengrp.command(name="rank", description="See where you (or someone else) place on the ktoken leaderboard")
+    async def rank(
+        self,
+        ctx: discord.ApplicationContext,
+        target: Option(discord.Member, description="Whose rank to check", required=False, default=None),
+    ):
+        member = target or ctx.author
+        index = self.get_rank_index()
+        position = index.rank(member.id)
+        if position is None:
+            return await ctx.respond(f"**{member.display_name}** isn't on the leaderboard (no ktokens).", ephemeral=True)
+        await ctx.respond(
+            f"🏆 **{member.display_name}** is ranked **#{position}** of {len(index)} "
+            f"with **{index.score(member.id)}** ktokens.",
+            ephemeral=True
+        )
+
     @ktokengrp.command(
         name="spend",
         description="Spend tokens to modify someone's command cooldown"
@@ -114,11 +177,11 @@ class TokenCog(commands.Cog):
         """
         user_id = ctx.author.id
 
-        # 1) Check user has enough tokens
-        current_balance = self.get_balance(user_id)
-        if current_balance < tokens:
+        # 1) Deduct tokens from the spender, if they have enough
+        new_balance = self.try_spend(user_id, tokens)
+        if new_balance is None:
             return await ctx.respond(
-                f"❌ You only have {current_balance} tokens, but that requires {tokens}.",
+                f"❌ You only have {self.get_balance(user_id)} tokens, but that requires {tokens}.",
                 ephemeral=True
             )
 
@@ -131,11 +194,9 @@ class TokenCog(commands.Cog):
         # 3) Modify target's cooldown
         success = self.modify_cooldown(cooldown, target.id, seconds)
         if not success:
+            self.add_tokens(user_id, tokens)  # refund
             return await ctx.respond("❌ Unknown cooldown type.", ephemeral=True)
 
-        # 4) Deduct tokens from the spender
-        self.set_balance(user_id, current_balance - tokens)
-
         # 5) Notify
         if mode == "reduce":
             verb = "reduced"
@@ -147,7 +208,7 @@ class TokenCog(commands.Cog):
         await ctx.respond(
             f"✅ {ctx.author.display_name} has {verb} **{target.display_name}**'s **{cooldown}** cooldown.\n"
             f"**Cooldown change:** {delta_str}\n"
-            f"**{ctx.author.display_name} current balance:** {current_balance - tokens}"
+            f"**{ctx.author.display_name} current balance:** {new_balance}"
         )
         
     @ktokengrp_owner.command(
@@ -161,13 +222,8 @@ class TokenCog(commands.Cog):
         tokens: Option(int, description="number of tokens to add/remove"),
     ):
         user_id = target.id
-        current_balance = self.get_balance(user_id)
-        new_balance = current_balance + tokens
         # prevent negative final balance
-        if new_balance < 0:
-            new_balance = 0
-
-        self.set_balance(user_id, new_balance)
+        new_balance = self.add_tokens(user_id, tokens)
 
         # Decide how you want to phrase it
         verb = "increased" if tokens >= 0 else "decreased"
@@ -229,20 +285,34 @@ class TokenCog(commands.Cog):
     bet: Option(int, description="How many tokens to bet", min_value=1)
     ):
         user_id = ctx.author.id
-        current_balance = self.get_balance(user_id)
-        if bet > current_balance:
+        # Deduct the bet up front
+        if self.try_spend(user_id, bet) is None:
             return await ctx.respond(
-                f"❌ You only have {current_balance} tokens, but you tried to bet {bet}.",
+                f"❌ You only have {self.get_balance(user_id)} tokens, but you tried to bet {bet}.",
                 ephemeral=True
             )
 
-        # Deduct the bet up front
-        self.set_balance(user_id, current_balance - bet)
-
         # Start the blackjack game
         view = BlackjackView(self, ctx.author, bet)
         await view.start(ctx)
 
+class LeaderboardView(BasePaginator):
+    """Paginated leaderboard; each page is read from the rank index when shown, in O(log n)."""
+    def __init__(self, rank_index, author_id):
+        self.rank_index = rank_index
+        super().__init__(None, author_id, title_prefix="Ktoken Leaderboard", emoji="🏆", color=discord.Color.gold())
+
+    def page_count(self):
+        return max(1, -(-len(self.rank_index) // LEADERBOARD_PAGE_SIZE))
+
+    def page_description(self):
+        start = self.current * LEADERBOARD_PAGE_SIZE
+        lines = [
+            f"**#{start + i + 1}** <@{user_id}> — {balance} ktokens"
+            for i, (user_id, balance) in enumerate(self.rank_index.top(start, LEADERBOARD_PAGE_SIZE))
+        ]
+        return "\n".join(lines) or "Nobody here!"
+
 class DiceBetView(discord.ui.View):
     """
     This view has 8 buttons: Higher, Lower, 1,2,3,4,5,6
@@ -284,20 +354,25 @@ class DiceBetView(discord.ui.View):
                 child.disabled = True
 
     async def do_roll(self, guess: str) -> str:
+        # Stake the bet first; another game may have spent the tokens since /ktoken gamba checked them
+        staked_balance = self.token_cog.try_spend(self.user_id, self.bet_amount)
+        if staked_balance is None:
+            return f"❌ You no longer have the {self.bet_amount} tokens you bet!"
+        old_balance = staked_balance + self.bet_amount
+
         roll = random.randint(1, 6)
-        old_balance = self.token_cog.get_balance(self.user_id)
         # default payout is 0 => user loses bet
-        new_balance = max(0, old_balance - self.bet_amount)
+        winnings = 0
         outcome_str = ""
 
         # Check if guess is "higher" or "lower"
         if guess == "higher" and roll in (4,5,6):
             # 1:1 payout => user gains +bet
-            new_balance = old_balance + self.bet_amount
+            winnings = self.bet_amount
             outcome_str = f"**WIN** +{self.bet_amount}"
 
         elif guess == "lower" and roll in (1,2,3):
-            new_balance = old_balance + self.bet_amount
+            winnings = self.bet_amount
             outcome_str = f"**WIN** +{self.bet_amount}"
 
         # Or if guess is a single digit
@@ -305,12 +380,14 @@ class DiceBetView(discord.ui.View):
             chosen_num = int(guess)
             if roll == chosen_num:
                 # 1:2 payout => user gains +2×bet
-                new_balance = old_balance + (self.bet_amount * 5)
+                winnings = self.bet_amount * 5
                 outcome_str = f"**WIN** +{self.bet_amount * 5}"
 
-        # Then finalize
-        self.token_cog.set_balance(self.user_id, new_balance)
-        net_change = new_balance - old_balance
+        # Then finalize: return the stake plus winnings (nothing on a loss)
+        new_balance = staked_balance
+        if winnings:
+            new_balance = self.token_cog.add_tokens(self.user_id, self.bet_amount + winnings)
+        net_change = winnings if winnings else -self.bet_amount
 
         # Format text
         if net_change >= 0:
@@ -537,10 +614,8 @@ class BlackjackView(discord.ui.View):
             result_text += res + "\n"
 
         # 1) Put tokens back
-        old_balance = self.token_cog.get_balance(self.player.id)
-        display_balance = old_balance + self.bet
-        final_balance = old_balance + total_return 
-        self.token_cog.set_balance(self.player.id, final_balance)
+        final_balance = self.token_cog.add_tokens(self.player.id, total_return)
+        display_balance = final_balance - total_return + self.bet
         balance_str = f"{display_balance} → {final_balance}"
 
         # 2) Net Change: total_spent is self.bet (and if split, 2× bet).
@@ -590,12 +665,9 @@ class BlackjackView(discord.ui.View):
         if not self.can_split():
             return await interaction.response.send_message("❌ You can't split this hand.", ephemeral=True)
 
-        current_balance = self.token_cog.get_balance(self.player.id)
-        if current_balance < self.bet:
-            return await interaction.response.send_message("❌ Not enough tokens to split.", ephemeral=True)
-
         # Deduct one more bet from player's balance
-        self.token_cog.set_balance(self.player.id, current_balance - self.bet)
+        if self.token_cog.try_spend(self.player.id, self.bet) is None:
+            return await interaction.response.send_message("❌ Not enough tokens to split.", ephemeral=True)
         self.total_spent += self.bet  # Increase total spent by another bet
 
         # Perform the split
@@ -1,11 +1,12 @@
 import discord
 import os
+import asyncio
 import time
 from dotenv import load_dotenv
 from discord.ext import commands
 from discord.commands import option
 load_dotenv()
-from utils import gsheet_utils, gimg_utils, bot_prefs
+from utils import gsheet_utils, gimg_utils, bot_prefs, drive_prefs, google_clients
 
 # allows for instant testing of functions within specified guilds
 GUILD_IDS = [int(os.getenv("GUILD_ID_1")), int(os.getenv("GUILD_ID_2"))]
@@ -21,8 +22,18 @@ bot.load_extension("cogs.kb_help_cog")      # Load HelpCog
 bot.load_extension("cogs.kb_msgman_cog")    # Load MessageManager
 bot.load_extension("cogs.kb_token_cog")     # Load Token Game Cog
 
+def _warm_google_clients():
+    # Google clients are built lazily; warm them once connected so the first command doesn't pay for it
+    try:
+        google_clients.get_gspread_client()
+        google_clients.get_drive_service()
+        drive_prefs.get_folder_id()
+    except Exception as e:
+        print(f"❗ Could not warm Google clients: {e}")
+
 @bot.event
 async def on_ready():
+    asyncio.get_running_loop().run_in_executor(None, _warm_google_clients)
     print("\n======================")
     print(f"🤖 Bot Name     : {bot.user}")
     print(f"🆔 Bot ID       : {bot.user.id}")
@@ -0,0 +1,51 @@
+import pytest
+
+from utils import bot_prefs
+
+@pytest.mark.parametrize("amount", [0, -5])
+def test_decr_if_at_least_rejects_non_positive_amounts(amount):
+    bot_prefs.set("test_decr_balance", 10)
+    with pytest.raises(ValueError):
+        bot_prefs.decr_if_at_least("test_decr_balance", amount)
+    assert bot_prefs.get("test_decr_balance") == 10
+
+@pytest.mark.parametrize("amount", [0, -5])
+def test_transfer_rejects_non_positive_amounts(amount):
+    bot_prefs.set("test_transfer_src", 10)
+    bot_prefs.set("test_transfer_dst", 0)
+    with pytest.raises(ValueError):
+        bot_prefs.transfer("test_transfer_src", "test_transfer_dst", amount)
+    assert bot_prefs.get("test_transfer_src") == 10
+    assert bot_prefs.get("test_transfer_dst") == 0
+
+def test_table_wrappers_reject_non_positive_amounts():
+    balances = bot_prefs.table("test_wallet")
+    balances.set(1, 10)
+    with pytest.raises(ValueError):
+        balances.decr_if_at_least(1, -3)
+    with pytest.raises(ValueError):
+        balances.transfer(2, 1, -3)   # would otherwise pull 3 from user 1 into user 2
+    assert balances.get(1) == 10
+    assert balances.get(2) is None
+
+def test_decr_and_transfer_check_funds():
+    balances = bot_prefs.table("test_purse")
+    balances.set(1, 10)
+    assert balances.decr_if_at_least(1, 11) is None
+    assert balances.decr_if_at_least(1, 4) == 6
+    assert not balances.transfer(1, 2, 7)
+    assert balances.transfer(1, 2, 6)
+    assert (balances.get(1), balances.get(2)) == (0, 6)
+
+def test_table_subscribers_see_writes_from_every_path():
+    balances = bot_prefs.table("test_ledger")
+    seen = []
+    balances.subscribe(lambda item_id, value: seen.append((item_id, value)))
+
+    balances.set(1, 10)
+    bot_prefs.set("test_ledger_2", 5)              # flat API
+    balances.transfer(1, 2, 4)                     # transaction
+    bot_prefs.delete("test_ledger_1")
+    bot_prefs._rebuild_ns_indexes()                # what load() does after replacing the store
+
+    assert seen == [(1, 10), (2, 5), (1, 6), (2, 9), (1, None), (None, None)]
@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("googleapiclient")
+from utils import gimg_utils
+
+ORIGINAL = "https://drive.google.com/uc?id=a"
+
+@pytest.fixture
+def fetches(monkeypatch):
+    calls = []
+    def fake_fetch(file_id):
+        calls.append(file_id)
+        return f"https://lh3.example/{file_id}-fresh=s220"
+    monkeypatch.setattr(gimg_utils, "_get_thumbnail_link", fake_fetch)
+    monkeypatch.setattr(gimg_utils, "_thumbnail_links", gimg_utils.OrderedDict())
+    return calls
+
+def image(width=3000, height=2000, thumbnail="https://lh3.example/a=s220"):
+    return {"id": "a", "name": "a.png", "thumbnailLink": thumbnail, "imageMediaMetadata": {"width": width, "height": height}}
+
+def sized(img, size):
+    return asyncio.run(gimg_utils.sized_image_url(img, size))
+
+def test_original_and_unknown_tiers_link_the_file(fetches):
+    assert sized(image(), None) == ORIGINAL
+    assert sized(image(), "original") == ORIGINAL
+    assert sized(image(), "huge") == ORIGINAL
+    assert fetches == []
+
+def test_image_already_within_tier_links_the_file(fetches):
+    assert sized(image(width=300, height=200), "small") == ORIGINAL
+    assert fetches == []
+
+def test_listed_thumbnail_is_resized_without_a_fetch(fetches):
+    img = image()
+    gimg_utils._remember_thumbnail("a", img["thumbnailLink"])
+    assert sized(img, "medium") == "https://lh3.example/a=s800"
+    assert sized(img, "large") == "https://lh3.example/a=s1600"
+    assert fetches == []
+
+def test_expired_thumbnail_is_refetched_once(fetches, monkeypatch):
+    img = image()
+    gimg_utils._remember_thumbnail("a", img["thumbnailLink"])
+    monkeypatch.setattr(gimg_utils, "THUMBNAIL_LINK_TTL_SECONDS", 0)
+    assert sized(img, "small") == "https://lh3.example/a-fresh=s320"
+    assert fetches == ["a"]
+
+def test_failed_or_missing_thumbnail_falls_back_to_the_file(fetches, monkeypatch):
+    monkeypatch.setattr(gimg_utils, "_get_thumbnail_link", lambda file_id: None)
+    assert sized(image(), "medium") == ORIGINAL
+
+    def broken(file_id):
+        raise RuntimeError("drive down")
+    monkeypatch.setattr(gimg_utils, "_get_thumbnail_link", broken)
+    gimg_utils._thumbnail_links.clear()
+    assert sized(image(), "medium") == ORIGINAL
@@ -0,0 +1,49 @@
+import threading
+from collections import defaultdict
+
+import pytest
+
+pytest.importorskip("gspread")
+from utils import gsheet_utils
+
+@pytest.fixture
+def snapshot_path(tmp_path, monkeypatch):
+    path = tmp_path / "sheets.snapshot"
+    monkeypatch.setattr(gsheet_utils, "SHEET_SNAPSHOT_PATH", str(path))
+    monkeypatch.setattr(gsheet_utils, "_sheet_cache", {})
+    monkeypatch.setattr(gsheet_utils, "_cache_stats", {})
+    return path
+
+def _wait_for_scheduled_snapshots():
+    # Snapshot jobs run on the fetch pool; a no-op queued behind them finishes once they have
+    gsheet_utils._fetch_executor.submit(lambda: None).result()
+    while gsheet_utils._snapshot_pending:
+        gsheet_utils._fetch_executor.submit(lambda: None).result()
+
+def test_snapshot_round_trip(snapshot_path):
+    table = defaultdict(list, {"a": ["1"], ("x", "y"): ["2"]})
+    gsheet_utils._store_table("sheet:tab", table, "v7")
+    gsheet_utils.save_snapshot()
+
+    gsheet_utils._sheet_cache.clear()
+    assert gsheet_utils.load_snapshot()
+    assert gsheet_utils._sheet_cache["sheet:tab"] == table
+    assert gsheet_utils._cache_stats["sheet:tab"]["version"] == "v7"
+
+def test_concurrent_schedules_write_one_complete_snapshot(snapshot_path):
+    def store_and_schedule(i):
+        gsheet_utils._store_table(f"sheet:tab{i}", defaultdict(list, {"k": [str(i)]}))
+        gsheet_utils._schedule_snapshot()
+
+    threads = [threading.Thread(target=store_and_schedule, args=(i,)) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    _wait_for_scheduled_snapshots()
+
+    # The last write saw every table, and no writer's temp file was left behind
+    gsheet_utils._sheet_cache.clear()
+    assert gsheet_utils.load_snapshot()
+    assert len(gsheet_utils._sheet_cache) == 20
+    assert [p.name for p in snapshot_path.parent.iterdir()] == [snapshot_path.name]
@@ -0,0 +1,72 @@
+from utils.img_cache import ImageDiskCache
+
+class FakeBackend:
+    def __init__(self, size: int = 10):
+        self.size = size
+        self.fetched = []
+
+    def fetch(self, file_id: str) -> bytes:
+        self.fetched.append(file_id)
+        return file_id.encode().ljust(self.size, b".")
+
+def image(file_id, md5="m1"):
+    return {"id": file_id, "name": f"{file_id}.png", "md5Checksum": md5}
+
+def test_miss_fetches_then_hit_reads_disk(tmp_path):
+    backend = FakeBackend()
+    cache = ImageDiskCache(str(tmp_path), max_bytes=100, backend=backend)
+
+    assert cache.get(image("a")) == b"a........."
+    assert cache.get(image("a")) == b"a........."
+    assert backend.fetched == ["a"]
+    assert image("a") in cache
+
+def test_edited_image_gets_a_new_entry(tmp_path):
+    backend = FakeBackend()
+    cache = ImageDiskCache(str(tmp_path), max_bytes=100, backend=backend)
+
+    cache.get(image("a", md5="m1"))
+    cache.get(image("a", md5="m2"))
+    assert backend.fetched == ["a", "a"]
+
+def test_evicts_least_recently_used(tmp_path):
+    backend = FakeBackend()
+    cache = ImageDiskCache(str(tmp_path), max_bytes=30, backend=backend)
+
+    for file_id in ("a", "b", "c"):
+        cache.get(image(file_id))
+    cache.get(image("a"))       # a is now the most recent
+    cache.get(image("d"))       # over budget: b goes
+
+    assert image("b") not in cache
+    assert all(image(file_id) in cache for file_id in ("a", "c", "d"))
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.m1", "c.m1", "d.m1"]
+
+def test_oversized_image_is_returned_but_not_stored(tmp_path):
+    cache = ImageDiskCache(str(tmp_path), max_bytes=5, backend=FakeBackend())
+
+    assert cache.get(image("a")) == b"a........."
+    assert image("a") not in cache
+    assert list(tmp_path.iterdir()) == []
+
+def test_rescans_previous_run_from_disk(tmp_path):
+    backend = FakeBackend()
+    ImageDiskCache(str(tmp_path), max_bytes=100, backend=backend).get(image("a"))
+
+    cache = ImageDiskCache(str(tmp_path), max_bytes=100, backend=backend)
+    assert cache.get(image("a")) == b"a........."
+    assert backend.fetched == ["a"]
+
+def test_prefetch_refills_evicted_popular_images(tmp_path):
+    backend = FakeBackend()
+    cache = ImageDiskCache(str(tmp_path), max_bytes=20, backend=backend)
+
+    for _ in range(3):
+        cache.get(image("a"))
+    cache.get(image("b"))
+    cache.get(image("c"))       # evicts a
+
+    assert cache.popular_uncached(5) == [image("a")]
+    assert cache.prefetch(cache.popular_uncached(5)) == 1
+    assert image("a") in cache
+    assert cache.prefetch([image("a")]) == 0   # already cached
@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("discord")
+from utils import bot_prefs
+from cogs.kb_token_cog import LEADERBOARD_PAGE_SIZE, LeaderboardView, TokenCog
+
+@pytest.fixture
+def cog():
+    balances = bot_prefs.table("ktoken_balance")
+    balances.clear()
+    token_cog = TokenCog(None)
+    yield token_cog
+    token_cog.cog_unload()
+    balances.clear()
+
+def board(token_cog):
+    return token_cog.get_rank_index().top(0, 100)
+
+def test_balance_helpers_keep_the_board_current(cog):
+    cog.set_balance(1, 50)
+    cog.add_tokens(2, 80)
+    assert board(cog) == [(2, 80), (1, 50)]
+
+    cog.add_tokens(1, 40)
+    assert board(cog) == [(1, 90), (2, 80)]
+    assert cog.try_spend(1, 15) == 75
+    assert cog.try_spend(2, 500) is None
+    assert board(cog) == [(2, 80), (1, 75)]
+    assert cog.get_rank_index().rank(1) == 2
+
+    cog.set_balance(2, 0)
+    assert board(cog) == [(1, 75)]
+    assert cog.get_rank_index().rank(2) is None
+
+def test_writes_outside_the_cog_reach_the_board(cog):
+    cog.set_balance(1, 10)
+    cog.get_rank_index()
+    bot_prefs.table("ktoken_balance").transfer(1, 3, 4)
+    bot_prefs.set("ktoken_balance_4", 99)
+    assert board(cog) == [(4, 99), (1, 6), (3, 4)]
+
+def test_leaderboard_pages_follow_the_index(cog):
+    for user_id in range(1, LEADERBOARD_PAGE_SIZE + 3):
+        cog.set_balance(user_id, user_id * 10)
+
+    async def pages():
+        view = LeaderboardView(cog.get_rank_index(), author_id=1)
+        first = view.page_description()
+        view.current = 1
+        return view.page_count(), first, view.page_description()
+
+    count, first, second = asyncio.run(pages())
+    assert count == 2
+    assert first.splitlines()[0] == f"**#1** <@{LEADERBOARD_PAGE_SIZE + 2}> — {(LEADERBOARD_PAGE_SIZE + 2) * 10} ktokens"
+    assert second.splitlines() == [f"**#{LEADERBOARD_PAGE_SIZE + 1}** <@2> — 20 ktokens", f"**#{LEADERBOARD_PAGE_SIZE + 2}** <@1> — 10 ktokens"]
@@ -0,0 +1,49 @@
+import random
+
+class AliasSampler:
+    """
+    Weighted sampling with Walker's alias method (Vose's construction).
+    Building the table is O(n); every draw afterwards is O(1), whatever the number of items or weights.
+
+    Example:
+        sampler = AliasSampler(["common", "rare"], [9, 1])
+        sampler.sample()  # → "common" 90% of the time
+    """
+    def __init__(self, items: list, weights: list[float]):
+        if len(items) != len(weights):
+            raise ValueError("items and weights must be the same length")
+
+        pairs = [(item, float(weight)) for item, weight in zip(items, weights) if weight > 0]
+        self.items = [item for item, _ in pairs]
+        n = len(self.items)
+        self._prob = [0.0] * n
+        self._alias = [0] * n
+        if not n:
+            return
+
+        total = sum(weight for _, weight in pairs)
+        scaled = [weight * n / total for _, weight in pairs]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self._prob[s] = scaled[s]
+            self._alias[s] = l
+            # The large column donates the rest of the small one's slot
+            scaled[l] = scaled[l] + scaled[s] - 1.0
+            (small if scaled[l] < 1.0 else large).append(l)
+
+        # Leftovers are 1.0 up to floating point error
+        for i in small + large:
+            self._prob[i] = 1.0
+
+    def __len__(self):
+        return len(self.items)
+
+    def sample(self, rng=random):
+        """Draw one item in O(1). Returns None if there is nothing to draw from."""
+        if not self.items:
+            return None
+        i = rng.randrange(len(self.items))
+        return self.items[i] if rng.random() < self._prob[i] else self.items[self._alias[i]]
@@ -1,4 +1,5 @@
 from utils import gsheet_utils                # For try_get_from_cache
+from utils.match_utils import PhraseMatcher  # For compiled keyword matching
 from collections import defaultdict  # For default dictionary structure
 import os
 import random
@@ -11,89 +12,131 @@ def generate_ngrams(tokens, n):
     """
     return [" ".join(tokens[i:i+n]) for i in range(len(tokens) - n + 1)]
 
-def categorize_question(question: str, category_keywords: dict) -> str:
+class CategoryMatcher:
+    """
+    Compiled form of the "categories" tab: every keyword phrase goes into one
+    token-level Aho–Corasick automaton, so scoring a question is a single pass
+    over its words instead of an n‑gram list scan per keyword.
+    """
+    def __init__(self, category_keywords: dict):
+        self.categories = list(category_keywords.keys())
+        self._matcher = PhraseMatcher()
+        phrase_ids = {}  # normalized phrase → pattern id
+
+        for category, keywords in category_keywords.items():
+            for kw in keywords:
+                normalized_kw = kw.lower()
+                words = normalized_kw.split()
+                # A keyword only matches if it equals a space-joined n‑gram of the question
+                if not words or " ".join(words) != normalized_kw:
+                    continue
+
+                pattern_id = phrase_ids.get(normalized_kw)
+                if pattern_id is None:
+                    pattern_id = self._matcher.add(words, defaultdict(int))
+                    phrase_ids[normalized_kw] = pattern_id
+                # Weight the match by the number of words in the keyword.
+                # e.g. "when will i" => 3 words => +3 points
+                self._matcher.payloads[pattern_id][category] += len(words)
+
+        self._matcher.build()
+
+    def categorize(self, question: str) -> str:
+        tokens = question.lower().split()
+
+        scores = dict.fromkeys(self.categories, 0)
+        for pattern_id in self._matcher.find_all(tokens):
+            for category, weight in self._matcher.payloads[pattern_id].items():
+                scores[category] += weight
+
+        # Pick the category with the highest total score.
+        # Ties go to whichever category appears first in the original dictionary order.
+        best_category, best_score = "general", 0
+        for category, score in scores.items():
+            if score > best_score:
+                best_category, best_score = category, score
+        return best_category
+
+def categorize_question(question: str, category_keywords) -> str:
     """
     Categorize the user's question using an n‑gram approach.
 
     :param question: The user’s question string (e.g., "When will I sleep?")
-    :param category_keywords: A dictionary mapping categories to lists of keywords,
+    :param category_keywords: A CategoryMatcher (see `load_category_matcher`), or a
+                             dictionary mapping categories to lists of keywords,
                              e.g. {
                                "timing": ["when", "when will i"],
                                "yesno": ["will i", "can i"]
                              }
 
-    :return: The name of the chosen category (e.g. "timing").
+    :return: The name of the chosen category (e.g. "timing"), or "general" if nothing matched.
     """
-    # 1) Convert the question to lowercase, then split into tokens (words).
-    tokens = question.lower().split()
-
-    # 2) Determine the maximum keyword size (in words) across all categories,
-    #    so we know how many n‑grams we should generate.
-    #    For example, if there's a keyword "when will i" (3 words),
-    #    max_kw_size becomes at least 3.
-    max_kw_size = 1
-    for keywords in category_keywords.values():
-        for kw in keywords:
-            kw_size = len(kw.split())  # number of words in this keyword
-            if kw_size > max_kw_size:
-                max_kw_size = kw_size
-
-
-    # 3) Generate all n‑grams from size 1 up to max_kw_size.
-    #    For instance, if max_kw_size is 3, we collect 1‑grams, 2‑grams, 3‑grams.
-    all_ngrams = []
-    for n in range(1, max_kw_size + 1):
-        all_ngrams.extend(generate_ngrams(tokens, n))
-    # Now all_ngrams might be something like:
-    # ["when", "will", "i", "sleep",  # (1‑grams)
-    #  "when will", "will i", "i sleep",  # (2‑grams)
-    #  "when will i", "will i sleep"]  # (3‑grams)
-
-
-     # 4) Score each category based on how many keyword phrases it matches in the question.
-    scores = {}
-    for category, keywords in category_keywords.items():
-        score = 0
-        for kw in keywords:
-            # Normalize the keyword, then see if that exact phrase is among our n‑grams
-            # e.g. if kw = "when will i", we look for "when will i" in all_ngrams
-            normalized_kw = kw.lower()
-            if normalized_kw in all_ngrams:
-                # 5) Weight the match by the number of words in the keyword.
-                #    e.g. "when will i" => 3 words => +3 points
-                score += len(normalized_kw.split())
-
-        scores[category] = score
-
-
-    # 6) Pick the category with the highest total score.
-    best_score = max(scores.values())
-    if best_score == 0:
-        return "general"
-    tied_categories = [cat for cat, s in scores.items() if s == best_score]
-
-    # Tie‑break by whichever category appears first in the original dictionary order
-    for cat in category_keywords:
-        if cat in tied_categories:
-            return cat
-
-    # Safety fallback, shouldn't reach here
-    return list(category_keywords.keys())[-1]
-
-def load_categories_from_sheet(sheet_ask_name : str, force=False):
-    return gsheet_utils.try_get_from_cache(sheet_ask_name, "categories", force=force)
-
-def load_responses_from_sheet(sheet_ask_name : str, force=False):
-    return gsheet_utils.try_get_from_cache(sheet_ask_name, "responses", force=force)
-
-def load_specials_from_sheet(sheet_ask_name : str, force=False):
-    return gsheet_utils.try_get_from_cache(sheet_ask_name, "specials", force=force)
-
-def load_role_substring_responses(sheet_ask_name : str, force=False):
-    return gsheet_utils.try_get_from_cache(sheet_ask_name, "role_ask_responses", num_key_columns=2, force=force)
-
-def load_role_responses(sheet_ask_name : str, force=False):
-    return gsheet_utils.try_get_from_cache(sheet_ask_name, "role_responses", num_key_columns=2, num_value_columns=1, force=force)
+    if not isinstance(category_keywords, CategoryMatcher):
+        category_keywords = CategoryMatcher(category_keywords)
+    return category_keywords.categorize(question)
+
+# Compiled matchers, rebuilt only when the underlying sheet cache is replaced (i.e. refreshed)
+_compiled_cache = {}  # (sheet_ask_name, tab) → (source table, compiled matcher)
+
+def _get_compiled(sheet_ask_name: str, tab_name: str, table: dict, compile_fn):
+    cache_key = (sheet_ask_name, tab_name)
+    cached = _compiled_cache.get(cache_key)
+    if cached and cached[0] is table:
+        return cached[1]
+
+    compiled = compile_fn(table)
+    _compiled_cache[cache_key] = (table, compiled)
+    return compiled
+
+# tab name → (num_key_columns, num_value_columns)
+_sheet_specs = {
+    "categories": (1, None),
+    "responses": (1, None),
+    "specials": (1, None),
+    "role_ask_responses": (2, None),
+    "role_responses": (2, 1),
+}
+
+# How long each tab is served from cache before it is refreshed in the background (seconds).
+# Refreshes of an unedited sheet only cost a Drive metadata check, so these can stay short.
+_sheet_ttls = {
+    "categories": 300,
+    "responses": 300,
+    "specials": 60,
+    "role_ask_responses": 60,
+    "role_responses": 60,
+}
+for _tab_name, _ttl in _sheet_ttls.items():
+    gsheet_utils.set_tab_ttl(_tab_name, _ttl)
+
+async def _load_tab(sheet_ask_name: str, tab_name: str, force=False):
+    num_key_columns, num_value_columns = _sheet_specs[tab_name]
+    return await gsheet_utils.try_get_from_cache_async(
+        sheet_ask_name, tab_name, num_key_columns=num_key_columns, num_value_columns=num_value_columns, force=force
+    )
+
+async def load_categories_from_sheet(sheet_ask_name : str, force=False):
+    categories = await _load_tab(sheet_ask_name, "categories", force=force)
+    _get_compiled(sheet_ask_name, "categories", categories, CategoryMatcher)
+    return categories
+
+async def load_category_matcher(sheet_ask_name : str, force=False) -> CategoryMatcher:
+    categories = await load_categories_from_sheet(sheet_ask_name, force=force)
+    return _get_compiled(sheet_ask_name, "categories", categories, CategoryMatcher)
+
+async def load_responses_from_sheet(sheet_ask_name : str, force=False):
+    return await _load_tab(sheet_ask_name, "responses", force=force)
+
+async def load_specials_from_sheet(sheet_ask_name : str, force=False):
+    return await _load_tab(sheet_ask_name, "specials", force=force)
+
+async def load_role_substring_responses(sheet_ask_name : str, force=False):
+    rules = await _load_tab(sheet_ask_name, "role_ask_responses", force=force)
+    _get_compiled(sheet_ask_name, "role_ask_responses", rules, RoleSubstringIndex)
+    return rules
+
+async def load_role_responses(sheet_ask_name : str, force=False):
+    return await _load_tab(sheet_ask_name, "role_responses", force=force)
 
 _sheet_loaders = {
     "categories": load_categories_from_sheet,
@@ -102,33 +145,59 @@ _sheet_loaders = {
     "role_ask_responses": load_role_substring_responses,
     "role_responses": load_role_responses,
 }
-def load_specified_ask_sheet(sheet_ask_name: str, key: str, force=False):
+async def load_specified_ask_sheet(sheet_ask_name: str, key: str, force=False):
     if key not in _sheet_loaders:
         raise ValueError(f"Unknown sheet cache key: {key}")
-    return _sheet_loaders[key](sheet_ask_name, force=force)
-
-def load_all_ask_sheets(sheet_ask_name: str):
-    for key, loader_fn in _sheet_loaders.items():
-        loader_fn(sheet_ask_name, force=True)
+    return await _sheet_loaders[key](sheet_ask_name, force=force)
 
-def get_substring_response(sheet_ask_name: str, username: str, roles: list[str], question: str):
-    role_substring_rules = load_role_substring_responses(sheet_ask_name)
+async def load_all_ask_sheets(sheet_ask_name: str):
+    # One batch request for every tab, then rebuild the compiled matchers
+    tables = await gsheet_utils.load_tables_async(sheet_ask_name, _sheet_specs)
+    _get_compiled(sheet_ask_name, "categories", tables.get("categories", {}), CategoryMatcher)
+    _get_compiled(sheet_ask_name, "role_ask_responses", tables.get("role_ask_responses", {}), RoleSubstringIndex)
 
-    # 1. Check user name as "role"
-    for (rule_role, substr), responses in role_substring_rules.items():
-        if rule_role == username and substr in question:
-            return random.choice(responses)
-
-    # 2. Fallback to actual roles
-    for role in roles:
+class RoleSubstringIndex:
+    """
+    Compiled form of the "role_ask_responses" tab: one character-level substring
+    matcher per role (or username), so a single scan of the question finds every
+    rule of that role that hits.
+    """
+    def __init__(self, role_substring_rules: dict):
+        self._matchers = {}  # rule_role → PhraseMatcher over its substrings (sheet order)
         for (rule_role, substr), responses in role_substring_rules.items():
-            if rule_role == role and substr in question:
-                return random.choice(responses)
+            matcher = self._matchers.get(rule_role)
+            if matcher is None:
+                matcher = self._matchers[rule_role] = PhraseMatcher()
+            matcher.add(substr, responses)
+
+        for matcher in self._matchers.values():
+            matcher.build()
+
+    def find_responses(self, names: list[str], question: str):
+        """Return the responses of the first matching rule, checking `names` in priority order."""
+        for name in names:
+            matcher = self._matchers.get(name)
+            if not matcher:
+                continue
+            hits = matcher.find_all(question)
+            if hits:
+                # Earliest rule in sheet order wins, same as a top-to-bottom scan
+                return matcher.payloads[min(hits)]
+        return None
+
+async def get_substring_response(sheet_ask_name: str, username: str, roles: list[str], question: str):
+    role_substring_rules = await load_role_substring_responses(sheet_ask_name)
+    index = _get_compiled(sheet_ask_name, "role_ask_responses", role_substring_rules, RoleSubstringIndex)
+
+    # 1. Check user name as "role", 2. Fallback to actual roles
+    responses = index.find_responses([username, *roles], question)
+    if responses is not None:
+        return random.choice(responses)
 
     return None
 
-def get_responses_for_role(sheet_ask_name: str, roles: list[str], key: str, username: str = None):
-    role_responses = load_role_responses(sheet_ask_name)
+async def get_responses_for_role(sheet_ask_name: str, roles: list[str], key: str, username: str = None):
+    role_responses = await load_role_responses(sheet_ask_name)
 
     # ✅ 1. Check if the user's actual username (not nickname) has a direct match
     if username:
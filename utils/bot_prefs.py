@@ -1,19 +1,84 @@
 import json
+import heapq
 import time
 import os
+import threading
+from contextlib import contextmanager
+from utils import prefs_codec
+from utils.prefs_cow import CowDict
+from utils.prefs_sqlite import SQLitePrefsStore
 
-# Internal store
-_store = {}
+# Internal store: an in-memory CowDict by default, or a SQLitePrefsStore after `use_sqlite`.
+# Both hand out cheap point-in-time snapshots, so saves can serialize off the event loop.
+_store = CowDict()
+
+# Journaled mode: every set/delete is appended to "<snapshot>.log" and replayed on load
+JOURNAL_SUFFIX = ".log"
+ROTATED_JOURNAL_SUFFIX = ".log.1"  # the segment a snapshot in progress will supersede
+JOURNAL_COMPACT_BYTES = 256 * 1024  # fold the log into a new snapshot once it grows past this
+_journal_file = None
+_journal_path = None
+
+# Time-based entries: key → absolute time.monotonic() deadline, plus a lazily pruned min-heap of (deadline, key)
+_deadlines = {}
+_expiry_heap = []
+SWEEP_BATCH_SIZE = 500
+
+# Snapshots whose path ends in this are written in the compact prefs_codec format, anything else as legacy JSON.
+# Loading detects the format from the file itself.
+COMPACT_SUFFIX = ".kbp"
+
+# Bumped on every change, so a persistence scheduler can tell whether anything needs saving
+_write_version = 0
+
+# Namespaced tables over "<namespace>_<int id>" keys: namespace → PrefsTable, and namespace → {id: None}
+# (an insertion-ordered set of the ids present), kept current by every write path below
+_tables = {}
+_ns_index = {}
+_ns_listeners = {}  # namespace → callbacks told about every write to it (see PrefsTable.subscribe)
 
 ### Singleton API ###
-def set(key, value, time_based=False):
-    _store[key] = {
+def _set_entry(key, value, time_based):
+    """Apply a write everywhere but the journal; returns its journal record."""
+    global _write_version
+    entry = {
         "value": value,
         "time_based": time_based,
         "saved_at": time.time() if time_based else None
     }
+    _store[key] = entry
+    if time_based:
+        _track_deadline(key, time.monotonic() + value)
+    else:
+        _deadlines.pop(key, None)
+    if _ns_index:
+        _index_key(key, True, value)
+    _write_version += 1
+    return {"k": key, "e": entry}
+
+def _delete_entry(key):
+    """Apply a delete everywhere but the journal; returns its journal record, or None if the key was absent."""
+    global _write_version
+    _deadlines.pop(key, None)
+    if _store.pop(key, None) is None:
+        return None
+    if _ns_index:
+        _index_key(key, False)
+    _write_version += 1
+    return {"k": key, "d": 1}
+
+def set(key, value, time_based=False):
+    """
+    Store `value` under `key`. The value is kept as-is, not copied: background saves read it from a shallow
+    snapshot, so never mutate a stored list/dict in place afterwards — set a new one (or a copy) instead.
+    """
+    _journal_append(_set_entry(key, value, time_based))
 
 def get(key, default=None):
+    deadline = _deadlines.get(key)
+    if deadline is not None:
+        return max(0, deadline - time.monotonic())
+
     entry = _store.get(key)
     if not entry:
         return default
@@ -30,52 +95,521 @@ def has(key):
     return key in _store
 
 def delete(key):
-    _store.pop(key, None)
+    record = _delete_entry(key)
+    if record is not None:
+        _journal_append(record)
 
 def all_keys():
     return list(_store.keys())
 
+def write_version():
+    """Counter bumped on every change; compare two readings to see whether the store is dirty."""
+    return _write_version
+
+### Atomic operations ###
+# Everything the bot does runs on one event loop, so a function that never awaits can't be interleaved with
+# another coroutine's writes. These do their read-modify-write inside one such call, which makes them atomic
+# for the cogs without any lock; `transaction` adds optimistic validation for blocks that might span an await.
+def incr(key, amount=1, default=0, floor=None):
+    """Add `amount` to a numeric pref (starting from `default`) and return the new value, clamped to `floor` if given."""
+    value = get(key, default) + amount
+    if floor is not None:
+        value = max(floor, value)
+    set(key, value)
+    return value
+
+def _check_positive(amount):
+    # A zero or negative amount would pass any "holds at least" check and move value the wrong way
+    if not amount > 0:
+        raise ValueError(f"amount must be positive, got {amount!r}")
+
+def decr_if_at_least(key, amount, default=0):
+    """Subtract `amount` (> 0) only if the pref holds at least that much. Returns the new value, or None if it didn't."""
+    _check_positive(amount)
+    value = get(key, default)
+    if value < amount:
+        return None
+    set(key, value - amount)
+    return value - amount
+
+def compare_and_set(key, expected, new_value, default=None):
+    """Set the pref to `new_value` only if it currently equals `expected`. Returns True if it was set."""
+    if get(key, default) != expected:
+        return False
+    set(key, new_value)
+    return True
+
+class TransactionConflict(Exception):
+    """A key read inside a transaction changed before it committed; nothing was written."""
+
+class Transaction:
+    """
+    Multi-key read-modify-write: reads are recorded, writes are staged, and on commit every read is checked
+    against the live value before all writes land together (one journal record). See `transaction()`.
+    """
+    def __init__(self):
+        self._reads = {}   # key → value seen
+        self._writes = {}  # key → (value, time_based), or None for a delete
+
+    def get(self, key, default=None):
+        if key in self._writes:
+            staged = self._writes[key]
+            return default if staged is None else staged[0]
+        value = get(key, default)
+        self._reads.setdefault(key, (value, default))
+        return value
+
+    def set(self, key, value, time_based=False):
+        self._writes[key] = (value, time_based)
+
+    def delete(self, key):
+        self._writes[key] = None
+
+    def commit(self):
+        for key, (value, default) in self._reads.items():
+            if get(key, default) != value:
+                raise TransactionConflict(key)
+
+        records = []
+        for key, staged in self._writes.items():
+            record = _delete_entry(key) if staged is None else _set_entry(key, *staged)
+            if record is not None:
+                records.append(record)
+        if records:
+            _journal_append(records[0] if len(records) == 1 else {"t": records})
+
+@contextmanager
+def transaction():
+    """
+    Stage several writes and apply them all or not at all:
+
+        with bot_prefs.transaction() as tx:
+            tx.set("a", tx.get("a", 0) - 5)
+            tx.set("b", tx.get("b", 0) + 5)
+
+    An exception inside the block discards the writes. If a value read in the block was changed by someone
+    else before the block ends (possible only if it awaited), TransactionConflict is raised instead.
+    """
+    tx = Transaction()
+    yield tx
+    tx.commit()
+
+def transfer(src_key, dst_key, amount, default=0):
+    """Move `amount` (> 0) from one numeric pref to another if the source holds enough. Returns True if moved."""
+    _check_positive(amount)
+    with transaction() as tx:
+        available = tx.get(src_key, default)
+        if available < amount:
+            return False
+        tx.set(src_key, available - amount)
+        tx.set(dst_key, tx.get(dst_key, default) + amount)
+    return True
+
+def keys_with_prefix(prefix):
+    """All keys starting with `prefix` (an index range scan on the SQLite backend)."""
+    if isinstance(_store, SQLitePrefsStore):
+        return _store.keys_with_prefix(prefix)
+    return [key for key in _store if key.startswith(prefix)]
+
+
+### Namespaced tables ###
+def _parse_id(text):
+    # Only canonical ints (no sign, no leading zeros) so f"{namespace}_{id}" maps back to the same key
+    if text.isdigit() and (text == "0" or text[0] != "0"):
+        return int(text)
+    return None
+
+def _index_key(key, present, value=None):
+    namespace, _, suffix = key.rpartition("_")
+    ids = _ns_index.get(namespace)
+    if ids is None:
+        return
+    item_id = _parse_id(suffix)
+    if item_id is None:
+        return
+    if present:
+        ids[item_id] = None
+    else:
+        ids.pop(item_id, None)
+    for listener in _ns_listeners.get(namespace, ()):
+        listener(item_id, value if present else None)
+
+def _build_ns_index(namespace):
+    prefix = f"{namespace}_"
+    ids = {}
+    for key in keys_with_prefix(prefix):
+        item_id = _parse_id(key[len(prefix):])
+        if item_id is not None:
+            ids[item_id] = None
+    _ns_index[namespace] = ids
+    for listener in _ns_listeners.get(namespace, ()):
+        listener(None, None)
+
+def _rebuild_ns_indexes():
+    for namespace in list(_ns_index):
+        _build_ns_index(namespace)
+
+class PrefsTable:
+    """
+    Typed view over every "<namespace>_<int id>" key, e.g. `table("ktoken_balance")` for the
+    `ktoken_balance_{user_id}` entries. It reads and writes through the flat API (same keys, same files),
+    and keeps an index of its ids, so listing a namespace never scans the whole store.
+
+    It is an index, not separate storage: values stay full entries in the one `_store`, so a table saves
+    no memory, and it is saved, loaded and journaled with everything else (the compact snapshot format
+    groups a namespace's ids on disk, but a namespace can't be persisted on its own).
+
+    Example:
+        balances = bot_prefs.table("ktoken_balance")
+        balances.set(user_id, 500)
+        top = sorted(balances.items(), key=lambda item: item[1], reverse=True)
+    """
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self.prefix = f"{namespace}_"
+
+    def key(self, item_id) -> str:
+        return f"{self.prefix}{int(item_id)}"
+
+    def get(self, item_id, default=None):
+        return get(self.key(item_id), default)
+
+    def set(self, item_id, value, time_based=False):
+        set(self.key(item_id), value, time_based=time_based)
+
+    def has(self, item_id) -> bool:
+        return has(self.key(item_id))
+
+    def delete(self, item_id):
+        delete(self.key(item_id))
+
+    def incr(self, item_id, amount=1, default=0, floor=None):
+        return incr(self.key(item_id), amount, default, floor)
+
+    def decr_if_at_least(self, item_id, amount, default=0):
+        return decr_if_at_least(self.key(item_id), amount, default)
+
+    def compare_and_set(self, item_id, expected, new_value, default=None):
+        return compare_and_set(self.key(item_id), expected, new_value, default)
+
+    def transfer(self, src_id, dst_id, amount, default=0):
+        return transfer(self.key(src_id), self.key(dst_id), amount, default)
+
+    def ids(self) -> list[int]:
+        return list(_ns_index[self.namespace])
+
+    def items(self) -> list[tuple]:
+        """(id, value) for every entry in the namespace."""
+        return [(item_id, get(self.key(item_id))) for item_id in self.ids()]
+
+    def clear(self) -> int:
+        """Delete every entry in the namespace. Returns how many were deleted."""
+        ids = self.ids()
+        for item_id in ids:
+            delete(self.key(item_id))
+        return len(ids)
+
+    def __contains__(self, item_id):
+        return int(item_id) in _ns_index[self.namespace]
+
+    def __len__(self):
+        return len(_ns_index[self.namespace])
+
+    def __iter__(self):
+        return iter(self.ids())
+
+    def subscribe(self, callback):
+        """
+        Call `callback(item_id, value)` after every write to the namespace, whatever the path (table or flat API,
+        transactions, expiry sweeps); value is None once the entry is gone. After the whole store is reloaded
+        (load, switching backend) it gets `callback(None, None)`: anything derived from the table must be rebuilt.
+        """
+        _ns_listeners.setdefault(self.namespace, []).append(callback)
+
+    def unsubscribe(self, callback):
+        listeners = _ns_listeners.get(self.namespace, [])
+        if callback in listeners:
+            listeners.remove(callback)
+
+def table(namespace):
+    """The PrefsTable for `namespace`, indexing its existing keys on first use."""
+    existing = _tables.get(namespace)
+    if existing is not None:
+        return existing
+    _build_ns_index(namespace)
+    _tables[namespace] = PrefsTable(namespace)
+    return _tables[namespace]
+
+def tables():
+    """Every namespace table created so far."""
+    return dict(_tables)
+
+
+### Expiry ###
+def _track_deadline(key, deadline):
+    _deadlines[key] = deadline
+    heapq.heappush(_expiry_heap, (deadline, key))
+    # Every re-set leaves a stale heap entry behind; rebuild once they outnumber the live ones
+    if len(_expiry_heap) > 2 * len(_deadlines) + 64:
+        _expiry_heap[:] = [(d, k) for k, d in _deadlines.items()]
+        heapq.heapify(_expiry_heap)
+
+def _rebuild_deadlines(items):
+    """Index the time-based entries among (key, entry) pairs whose saved_at/value are wall-clock based."""
+    _deadlines.clear()
+    now, now_mono = time.time(), time.monotonic()
+    for key, entry in items:
+        if entry.get("time_based"):
+            remaining = entry["value"] - (now - (entry.get("saved_at") or now))
+            _deadlines[key] = now_mono + remaining
+    _expiry_heap[:] = [(d, k) for k, d in _deadlines.items()]
+    heapq.heapify(_expiry_heap)
+
+def sweep_expired(max_batch=SWEEP_BATCH_SIZE):
+    """
+    Drop up to `max_batch` time-based entries whose countdown has reached zero. Returns how many were
+    dropped; a full batch means there may be more. Evictions aren't journaled, as load skips expired entries anyway.
+    """
+    global _write_version
+    now_mono = time.monotonic()
+    evicted = 0
+    while _expiry_heap and evicted < max_batch and _expiry_heap[0][0] <= now_mono:
+        deadline, key = heapq.heappop(_expiry_heap)
+        if _deadlines.get(key) != deadline:
+            continue  # re-set or deleted since this heap entry was pushed
+        del _deadlines[key]
+        _store.pop(key, None)
+        if _ns_index:
+            _index_key(key, False)
+        evicted += 1
+    _write_version += evicted
+    return evicted
+
+def active_deadline_count():
+    return len(_deadlines)
+
+
+### Backends ###
+def use_sqlite(db_path, cache_size=4096):
+    """
+    Keep prefs in a SQLite database instead of the in-memory dict. Writes are committed in batches and
+    the API above is unchanged. Returns True if the database already held prefs.
+    """
+    global _store
+    if isinstance(_store, SQLitePrefsStore) and _store.db_path == db_path:
+        return len(_store) > 0
+    disable_journal()
+    store = SQLitePrefsStore(db_path, cache_size=cache_size)
+    if isinstance(_store, CowDict) and _store and not len(store):
+        store.replace_all(dict(_store.items()))
+    else:
+        _rebuild_deadlines(store.time_based_items())
+    _store = store
+    _rebuild_ns_indexes()
+    print(f"[BotPrefs] 🗄️ Using SQLite store at {db_path}")
+    return len(_store) > 0
+
+def using_sqlite():
+    return isinstance(_store, SQLitePrefsStore)
+
+def flush():
+    """Commit buffered writes (SQLite backend only). Returns how many were written."""
+    if isinstance(_store, SQLitePrefsStore):
+        return _store.flush()
+    return 0
+
+def _replace_store(entries):
+    global _store, _write_version
+    _write_version += 1
+    if isinstance(_store, SQLitePrefsStore):
+        _store.replace_all(entries)
+    else:
+        _store = CowDict(entries)
+
+
+### Journal ###
+def _journal_append(record):
+    if _journal_file is None:
+        return
+    try:
+        _journal_file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        _journal_file.flush()
+    except Exception as e:
+        print(f"[BotPrefs] ❌ Failed to append to journal: {e}")
+
+def _replay_journal(raw, journal_path):
+    """Apply the records in a journal file on top of a raw snapshot dict. Returns how many were applied."""
+    if not os.path.exists(journal_path):
+        return 0
+
+    applied = 0
+    with open(journal_path, "r") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line torn by a crash mid-write; the records around it are intact
+                continue
+            for change in record.get("t", [record]):
+                if change.get("d"):
+                    raw.pop(change["k"], None)
+                else:
+                    raw[change["k"]] = change["e"]
+            applied += 1
+    return applied
+
+def enable_journal(filepath):
+    """
+    Switch to journaled mode for the snapshot at `filepath`: writes are appended to `filepath + ".log"`
+    as they happen, so persisting costs O(changes) and a crash loses at most the write being appended.
+    Call after `load` so the log picks up where the snapshot + replay left off.
+    """
+    global _journal_file, _journal_path
+    path = filepath + JOURNAL_SUFFIX
+    if _journal_path == path:
+        return
+    disable_journal()
+    _journal_path = path
+    _journal_file = open(path, "a")
+    if _journal_file.tell() > 0:
+        # Make sure a torn last line can't swallow the next record
+        _journal_file.write("\n")
+        _journal_file.flush()
+    print(f"[BotPrefs] 📓 Journaling writes to {path}")
+
+def _rotate_journal():
+    """Start a fresh journal segment; the current one moves aside until the snapshot covering it is written."""
+    global _journal_file
+    path = _journal_path
+    rotated = path[:-len(JOURNAL_SUFFIX)] + ROTATED_JOURNAL_SUFFIX
+    _journal_file.close()
+    if os.path.exists(rotated):
+        # An earlier snapshot never completed; its segment still has to be covered
+        with open(path, "r") as src, open(rotated, "a") as dst:
+            dst.write("\n" + src.read())
+        os.remove(path)
+    else:
+        os.replace(path, rotated)
+    _journal_file = open(path, "a")
+    return rotated
+
+def disable_journal():
+    global _journal_file, _journal_path
+    if _journal_file is not None:
+        _journal_file.close()
+    _journal_file = None
+    _journal_path = None
+
+def journal_size():
+    """Size of the active journal in bytes (0 when not journaling)."""
+    if _journal_file is None:
+        return 0
+    return _journal_file.tell()
+
+def journaling():
+    return _journal_file is not None
+
+def journal_needs_compaction(min_bytes=JOURNAL_COMPACT_BYTES):
+    """Whether the journal has grown enough that it should be folded into a fresh snapshot."""
+    return _journal_file is not None and journal_size() >= min_bytes
+
 
 ### Persistence API ###
-def save(filepath):
-    """Save to a JSON file."""
+def _live_items(items, now):
+    # Judged from each entry's own wall-clock fields, so this is safe to run on a snapshot in another thread
+    return {
+        key: entry for key, entry in items
+        if not (entry.get("time_based") and entry["value"] - (now - (entry.get("saved_at") or now)) <= 0)
+    }
+
+def _write_snapshot(entries, filepath, superseded_journal=None):
     try:
-        with open(filepath, "w") as f:
-            json.dump(_store, f, indent=2)
+        tmp_path = f"{filepath}.{threading.get_ident()}.tmp"
+        if filepath.endswith(COMPACT_SUFFIX):
+            with open(tmp_path, "wb") as f:
+                f.write(prefs_codec.encode(entries))
+        else:
+            with open(tmp_path, "w") as f:
+                json.dump(entries, f, indent=2)
+        os.replace(tmp_path, filepath)
+
+        if superseded_journal and os.path.exists(superseded_journal):
+            os.remove(superseded_journal)
         print(f"[BotPrefs] ✅ Saved state to {filepath}")
+        return True
+    except Exception as e:
+        print(f"[BotPrefs] ❌ Failed to save: {e}")
+        return False
+
+def prepare_save(filepath):
+    """
+    The part of a save that has to run on the event loop: fixes what will be written (and, in journaled mode,
+    starts a fresh journal segment). Returns a function that writes it to `filepath` and can run in any thread.
+    """
+    superseded_journal = None
+    if _journal_file is not None and _journal_path == filepath + JOURNAL_SUFFIX:
+        superseded_journal = _rotate_journal()
+
+    # O(pages) copy-on-write view (or a pinned SQLite read transaction); writes carry on while it's serialized
+    view = _store.snapshot()
+
+    def _write():
+        with view:
+            return _write_snapshot(_live_items(view.items(), time.time()), filepath, superseded_journal)
+    return _write
+
+def save(filepath):
+    """Save to a snapshot file (compact for COMPACT_SUFFIX paths, JSON otherwise). In journaled mode the snapshot supersedes the log written so far."""
+    try:
+        return prepare_save(filepath)()
     except Exception as e:
         print(f"[BotPrefs] ❌ Failed to save: {e}")
+        return False
 
 def load(filepath):
-    """Load from a JSON file, adjusting time-based values."""
-    if not os.path.exists(filepath):
+    """Load from a compact or legacy JSON snapshot (plus its journal, if any), adjusting time-based values."""
+    journal_path = filepath + JOURNAL_SUFFIX
+    rotated_journal_path = filepath + ROTATED_JOURNAL_SUFFIX
+    if not any(os.path.exists(path) for path in (filepath, journal_path, rotated_journal_path)):
         print(f"[BotPrefs] ⚠️ No existing file at {filepath}, starting fresh.")
         return
 
-    global _store
     try:
-        with open(filepath, "r") as f:
-            raw = json.load(f)
+        raw = {}
+        if os.path.exists(filepath):
+            with open(filepath, "rb") as f:
+                data = f.read()
+            raw = prefs_codec.decode(data) if prefs_codec.is_compact(data) else json.loads(data)
+
+        # An interrupted save leaves the older segment next to the live one
+        replayed = _replay_journal(raw, rotated_journal_path) + _replay_journal(raw, journal_path)
+        if replayed:
+            print(f"[BotPrefs] 📓 Replayed {replayed} journal records from {journal_path}")
 
         now = time.time()
-        _store = {}
+        loaded = {}
         for key, entry in raw.items():
             time_based = entry.get("time_based", False)
             saved_at = entry.get("saved_at", now)
             value = entry.get("value")
 
-            # Adjust time-based values
+            # Adjust time-based values; finished countdowns are dropped
             if time_based:
                 elapsed = now - saved_at
-                adjusted = max(0, value - elapsed)
-                _store[key] = {
+                adjusted = value - elapsed
+                if adjusted <= 0:
+                    continue
+                loaded[key] = {
                     "value": adjusted,
                     "time_based": True,
                     "saved_at": now  # reset clock
                 }
             else:
-                _store[key] = entry
+                loaded[key] = entry
 
+        _replace_store(loaded)
+        _rebuild_deadlines(loaded.items())
+        _rebuild_ns_indexes()
         print(f"[BotPrefs] ✅ Loaded state from {filepath}")
     except Exception as e:
         print(f"[BotPrefs] ❌ Failed to load: {e}")
\ No newline at end of file
@@ -1,70 +1,131 @@
 import os
+import hashlib
+from googleapiclient.errors import HttpError
 from googleapiclient.http import MediaFileUpload, MediaIoBaseDownload
 import io
-from googleapiclient.discovery import build
-from google.oauth2 import service_account
+from utils import google_clients
 from dotenv import load_dotenv
 
-SCOPES = [
-    "https://www.googleapis.com/auth/drive",  # Full access
-    "https://www.googleapis.com/auth/drive.metadata.readonly",
-    "https://www.googleapis.com/auth/drive.file"
-]
-SERVICE_ACCOUNT_JSON = os.environ.get("GOOGLE_CREDS_PATH")
-if not SERVICE_ACCOUNT_JSON:
-    raise RuntimeError("Missing GOOGLE_CREDS_PATH for Drive service.")
+PREFS_FILENAME = "kringbot_prefs.kbp"
+# Older deployments uploaded the JSON snapshot under this name; still readable for migration
+LEGACY_PREFS_FILENAME = "kringbot_prefs.json"
 
-credentials = service_account.Credentials.from_service_account_file(
-    SERVICE_ACCOUNT_JSON, scopes=SCOPES
-)
-drive_service = build('drive', 'v3', credentials=credentials)
+# The prefs folder ID is resolved on first use (not at import), so loading the cog does no network calls
+_folder_id = None
 
-PREFS_FILENAME = "kringbot_prefs.json"
+# Drive file ID and last known content md5 per prefs filename, so uploads update in place and skip no-ops
+_file_ids = {}
+_uploaded_md5 = {}
+RESUMABLE_UPLOAD_THRESHOLD_BYTES = 5 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024
+
+def get_drive_service():
+    """The shared Drive service (see utils/google_clients)."""
+    return google_clients.get_drive_service()
 
 def _get_folder_id_by_name(folder_name: str):
     query = f"mimeType = 'application/vnd.google-apps.folder' and name = '{folder_name}' and trashed = false"
-    results = drive_service.files().list(q=query, fields="files(id, name)").execute()
+    results = get_drive_service().files().list(q=query, fields="files(id, name)").execute()
     folders = results.get("files", [])
     if folders:
         return folders[0]['id']
     return None
 
-FOLDER_ID = _get_folder_id_by_name(os.environ.get("BOT_PREFS_FOLDER_ID"))
+def get_folder_id():
+    """Resolve (once) the Drive folder that holds the prefs file."""
+    global _folder_id
+    if _folder_id is None:
+        _folder_id = _get_folder_id_by_name(os.environ.get("BOT_PREFS_FOLDER_ID"))
+    return _folder_id
+
+def _mimetype(filename: str):
+    return "application/json" if filename.endswith(".json") else "application/octet-stream"
+
+def _file_md5(local_path: str):
+    digest = hashlib.md5()
+    with open(local_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _find_file(folder_id: str, filename: str):
+    """Look up (and cache) the Drive file for `filename`, noting its md5 so unchanged content isn't re-sent."""
+    if filename in _file_ids:
+        return _file_ids[filename]
+
+    query = f"'{folder_id}' in parents and name = '{filename}' and trashed = false"
+    files = get_drive_service().files().list(q=query, fields="files(id, md5Checksum)").execute().get("files", [])
+    if not files:
+        return None
+
+    # Older versions re-created the file on every save; keep one copy and clear out any strays
+    for stray in files[1:]:
+        get_drive_service().files().delete(fileId=stray["id"]).execute()
+    _file_ids[filename] = files[0]["id"]
+    if files[0].get("md5Checksum"):
+        _uploaded_md5[filename] = files[0]["md5Checksum"]
+    return files[0]["id"]
+
+def _execute_upload(request, resumable: bool):
+    if not resumable:
+        return request.execute()
+    response = None
+    while response is None:
+        status, response = request.next_chunk()
+    return response
 
-def upload_to_drive(local_path=PREFS_FILENAME):
-    if not FOLDER_ID:
+def upload_to_drive(local_path=PREFS_FILENAME, filename=PREFS_FILENAME):
+    """
+    Upload the prefs file, replacing the existing Drive file's content in place (same file ID).
+    Skipped when the content matches what was last uploaded. Returns True if anything was sent.
+    """
+    folder_id = get_folder_id()
+    if not folder_id:
         raise RuntimeError("Missing BOT_PREFS_FOLDER_ID in .env")
 
-    # Delete any old copy with same name
-    query = f"'{FOLDER_ID}' in parents and name = '{PREFS_FILENAME}' and trashed = false"
-    existing = drive_service.files().list(q=query, fields="files(id)").execute().get("files", [])
-    for file in existing:
-        drive_service.files().delete(fileId=file["id"]).execute()
+    md5 = _file_md5(local_path)
+    file_id = _find_file(folder_id, filename)
+    if file_id and _uploaded_md5.get(filename) == md5:
+        print(f"[DrivePrefs] 💤 {filename} unchanged on Drive — skipping upload.")
+        return False
+
+    resumable = os.path.getsize(local_path) > RESUMABLE_UPLOAD_THRESHOLD_BYTES
+    media = MediaFileUpload(local_path, mimetype=_mimetype(filename), resumable=resumable, chunksize=UPLOAD_CHUNK_SIZE)
+    files = get_drive_service().files()
+    response = None
+    if file_id:
+        try:
+            response = _execute_upload(files.update(fileId=file_id, media_body=media, fields="id, md5Checksum"), resumable)
+        except HttpError as e:
+            if e.resp.status != 404:
+                raise
+            # Deleted on Drive since we cached its ID; fall through and create it again
+            _file_ids.pop(filename, None)
+    if response is None:
+        metadata = {'name': filename, 'parents': [folder_id]}
+        response = _execute_upload(files.create(body=metadata, media_body=media, fields="id, md5Checksum"), resumable)
 
-    # Upload fresh file
-    media = MediaFileUpload(local_path, mimetype='application/json')
-    metadata = {'name': PREFS_FILENAME, 'parents': [FOLDER_ID]}
-    drive_service.files().create(body=metadata, media_body=media).execute()
-    print(f"[DrivePrefs] ✅ Uploaded {PREFS_FILENAME} to Drive.")
+    _file_ids[filename] = response["id"]
+    _uploaded_md5[filename] = response.get("md5Checksum") or md5
+    print(f"[DrivePrefs] ✅ Uploaded {filename} to Drive.")
+    return True
 
-def download_from_drive(local_path=PREFS_FILENAME):
-    if not FOLDER_ID:
+def download_from_drive(local_path=PREFS_FILENAME, filename=PREFS_FILENAME):
+    folder_id = get_folder_id()
+    if not folder_id:
         raise RuntimeError("Missing BOT_PREFS_FOLDER_ID in .env")
 
-    query = f"'{FOLDER_ID}' in parents and name = '{PREFS_FILENAME}' and trashed = false"
-    results = drive_service.files().list(q=query, fields="files(id)").execute()
-    files = results.get("files", [])
-    if not files:
-        print("[DrivePrefs] ⚠️ No prefs file found on Drive.")
+    file_id = _find_file(folder_id, filename)
+    if not file_id:
+        print(f"[DrivePrefs] ⚠️ No {filename} found on Drive.")
         return False
 
-    file_id = files[0]['id']
-    request = drive_service.files().get_media(fileId=file_id)
-    fh = io.FileIO(local_path, 'wb')
-    downloader = MediaIoBaseDownload(fh, request)
-    done = False
-    while not done:
-        status, done = downloader.next_chunk()
+    request = get_drive_service().files().get_media(fileId=file_id)
+    with io.FileIO(local_path, 'wb') as fh:
+        downloader = MediaIoBaseDownload(fh, request)
+        done = False
+        while not done:
+            status, done = downloader.next_chunk()
 
-    print(f"[DrivePrefs] ✅ Downloaded {PREFS_FILENAME} from Drive.")
+    print(f"[DrivePrefs] ✅ Downloaded {filename} from Drive.")
     return True
@@ -1,22 +1,140 @@
 import os
+import re
+import time
 import random
-from googleapiclient.discovery import build
-from google.oauth2 import service_account
+import asyncio
+import itertools
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from utils import google_clients
+from utils.img_cache import ImageDiskCache
+from utils.alias_sampler import AliasSampler
 from dotenv import load_dotenv
 
-SCOPES = ['https://www.googleapis.com/auth/drive.readonly']
-SERVICE_ACCOUNT_JSON = os.environ.get("GOOGLE_CREDS_PATH")
-if not SERVICE_ACCOUNT_JSON:
-    raise RuntimeError("Missing GOOGLE_CREDS_PATH environment variable.")
-credentials = service_account.Credentials.from_service_account_file(
-    SERVICE_ACCOUNT_JSON, scopes=SCOPES)
-drive_service = build('drive', 'v3', credentials=credentials)
+def get_drive_service():
+    """The shared Drive service (see utils/google_clients)."""
+    return google_clients.get_drive_service()
 
 # Caches
 _folder_id_cache = {}      # folder_name → folder_id
-_image_list_cache = {}     # folder_id → list of images
+_image_list_cache = {}     # folder_id → list of images (grows page by page while a listing streams in)
+_name_index_cache = {}     # folder_id → ImageNameIndex over that folder's image names
+_folder_loads = {}         # folder_id → {"first_page": asyncio.Event, "task": asyncio.Task} of the running listing
+_changes_page_token = None # Drive changes feed cursor, shared by every cached folder
+_folder_versions = defaultdict(int)  # folder_id → bumped whenever its cached image list changes
+_image_positions = {}      # folder_id → {file_id: index in its cached list}, only for folders whose listing is complete
+_pending_changes = {}      # folder_id → changes seen while a listing of it was running, replayed once it completes
+
+# Fields kept for each image, in both folder listings and the changes feed
+IMAGE_FIELDS = "id, name, md5Checksum, size, thumbnailLink, imageMediaMetadata(width, height)"
+
+# Longest-side pixel targets for embed sizes; "original" always links the full file
+IMAGE_SIZE_TIERS = {
+    "small": 320,
+    "medium": 800,
+    "large": 1600,
+}
+
+# Drive's thumbnailLink is signed and expires after a few hours. Links arrive with every listing and change,
+# and are trusted for this long after that; an image whose link is older gets it re-fetched when sent.
+THUMBNAIL_LINK_TTL_SECONDS = 60 * 60
+_thumbnail_links = OrderedDict()  # file_id → (thumbnailLink or None, monotonic time received), oldest first
+
+# Optional local cache of image bytes, for sending images as attachments (see enable_disk_cache)
+_disk_cache = None
+
+# Drive calls are blocking, so they run on a small pool off the event loop
+IMAGE_PAGE_SIZE = 1000
+DRIVE_FETCH_WORKERS = 2
+_drive_executor = ThreadPoolExecutor(max_workers=DRIVE_FETCH_WORKERS, thread_name_prefix="gimg")
+# Image downloads get their own pool, so a batch of prefetches never queues ahead of folder listings
+IMAGE_DOWNLOAD_WORKERS = 2
+_download_executor = ThreadPoolExecutor(max_workers=IMAGE_DOWNLOAD_WORKERS, thread_name_prefix="gimg-dl")
+# Thumbnail link re-fetches sit on the send path, so they don't wait behind listings or downloads either
+THUMBNAIL_FETCH_WORKERS = 2
+_thumbnail_executor = ThreadPoolExecutor(max_workers=THUMBNAIL_FETCH_WORKERS, thread_name_prefix="gimg-thumb")
+
+class ImageNameIndex:
+    """
+    Character n‑gram index (n ≤ 3) over lowercase image names.
+    A partial-name lookup intersects a few posting sets instead of scanning every name,
+    and returns all matches ranked exact → prefix → substring.
+    """
+    GRAM_SIZE = 3
+
+    def __init__(self):
+        self._entries = {}              # file_id → (order added, lowercase name, lowercase stem, image)
+        self._grams = defaultdict(set)  # n‑gram → file_ids whose name contains it
+        self._next_order = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _name_grams(self, name: str):
+        return {name[i:i + n] for n in range(1, self.GRAM_SIZE + 1) for i in range(len(name) - n + 1)}
+
+    def add(self, image: dict):
+        file_id = image["id"]
+        if file_id in self._entries:
+            self.remove(file_id)
+
+        name = image["name"].lower()
+        stem = os.path.splitext(name)[0]
+        self._entries[file_id] = (self._next_order, name, stem, image)
+        self._next_order += 1
+        for gram in self._name_grams(name):
+            self._grams[gram].add(file_id)
+
+    def remove(self, file_id: str):
+        entry = self._entries.pop(file_id, None)
+        if not entry:
+            return
+        for gram in self._name_grams(entry[1]):
+            ids = self._grams.get(gram)
+            if ids is not None:
+                ids.discard(file_id)
+                if not ids:
+                    del self._grams[gram]
+
+    def search(self, query: str) -> list[dict]:
+        """Return every image whose name contains `query`, best matches first."""
+        query = query.strip().lower()
+        if not query:
+            return []
+
+        if len(query) <= self.GRAM_SIZE:
+            candidates = self._grams.get(query, set())
+        else:
+            postings = [self._grams.get(query[i:i + self.GRAM_SIZE]) for i in range(len(query) - self.GRAM_SIZE + 1)]
+            if not all(postings):
+                return []
+            postings.sort(key=len)
+            candidates = set.intersection(*postings)
+
+        ranked = []
+        for file_id in candidates:
+            order, name, stem, image = self._entries[file_id]
+            if query not in name:
+                continue  # every trigram matched, but not contiguously
+            if name == query or stem == query:
+                tier = 0
+            elif name.startswith(query):
+                tier = 1
+            else:
+                tier = 2
+            # Within a tier keep Drive's listing order
+            ranked.append((tier, order, image))
+
+        ranked.sort(key=lambda match: match[:2])
+        return [image for _, _, image in ranked]
 
 # --- Internal helpers ---
+async def _run_blocking(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_drive_executor, fn, *args)
+
+async def _run_download(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_download_executor, fn, *args)
+
 def _get_folder_id_by_name(folder_name: str):
     """Fetch and cache the folder ID from its name."""
     folder_name = folder_name.strip().lower()
@@ -24,7 +142,7 @@ def _get_folder_id_by_name(folder_name: str):
         return _folder_id_cache[folder_name]
 
     query = f"mimeType = 'application/vnd.google-apps.folder' and name = '{folder_name}' and trashed = false"
-    results = drive_service.files().list(q=query, fields="files(id, name)").execute()
+    results = get_drive_service().files().list(q=query, fields="files(id, name)").execute()
     folders = results.get('files', [])
 
     if folders:
@@ -33,55 +151,412 @@ def _get_folder_id_by_name(folder_name: str):
         return folder_id
     return None
 
-def _load_image_list_for_folder(folder_id: str):
-    """List all images inside the given folder ID."""
+async def _get_folder_id(folder_name: str):
+    folder_id = _folder_id_cache.get(folder_name.strip().lower())
+    if folder_id:
+        return folder_id
+    return await _run_blocking(_get_folder_id_by_name, folder_name)
+
+def _list_image_page(folder_id: str, page_token: str = None) -> dict:
+    """List one page of images inside the given folder ID."""
     query = f"'{folder_id}' in parents and mimeType contains 'image/' and trashed = false"
-    results = drive_service.files().list(
+    return get_drive_service().files().list(
         q=query,
-        fields="files(id, name)",
-        pageSize=1000
+        fields=f"nextPageToken, files({IMAGE_FIELDS})",
+        pageSize=IMAGE_PAGE_SIZE,
+        pageToken=page_token
     ).execute()
 
-    return results.get("files", [])
+async def _stream_image_list(folder_id: str, images: list, name_index: ImageNameIndex, first_page: asyncio.Event) -> bool:
+    """Page through the folder listing, adding each page to `images` and `name_index` as soon as it arrives."""
+    page_token = None
+    try:
+        # Take the changes cursor before listing, so nothing edited mid-listing is missed by later syncs
+        await _ensure_changes_token()
+        while True:
+            page = await _run_blocking(_list_image_page, folder_id, page_token)
+            files = page.get("files", [])
+            images.extend(files)
+            for image in files:
+                _remember_thumbnail(image["id"], image.get("thumbnailLink"))
+                name_index.add(image)
+            if _image_list_cache.get(folder_id) is images:
+                _folder_versions[folder_id] += 1
+            first_page.set()
 
-def _get_images_in_folder(folder_name: str):
-    """Return cached or freshly loaded list of images for a folder."""
-    folder_id = _get_folder_id_by_name(folder_name)
+            page_token = page.get("nextPageToken")
+            if not page_token:
+                return True
+    except Exception as e:
+        print(f"[GImg] ❌ Failed to list images in folder {folder_id}: {e}")
+        return False
+    finally:
+        first_page.set()  # Never leave waiters hanging
+
+def _start_folder_load(folder_id: str, replace_when_done: bool = False) -> dict:
+    """
+    Start (or join) a streaming listing of a folder.
+    A first load streams straight into the cache so it is usable after one page;
+    a refresh fills a new list and swaps it in only once the listing is complete.
+    """
+    load = _folder_loads.get(folder_id)
+    if load and not load["task"].done():
+        return load
+
+    images = []
+    name_index = ImageNameIndex()
+    if not replace_when_done:
+        _image_list_cache[folder_id] = images
+        _name_index_cache[folder_id] = name_index
+
+    first_page = asyncio.Event()
+    _pending_changes[folder_id] = []
+    task = asyncio.ensure_future(_stream_image_list(folder_id, images, name_index, first_page))
+
+    def _finish(done):
+        pending = _pending_changes.pop(folder_id, [])
+        complete = not done.cancelled() and done.result()
+        if complete:
+            if replace_when_done:
+                _image_list_cache[folder_id] = images
+                _name_index_cache[folder_id] = name_index
+                _folder_versions[folder_id] += 1
+            if len({image["id"] for image in images}) != len(images):
+                # A file edited mid-listing can show up on two pages; keep one entry, with the later data
+                images[:] = {image["id"]: image for image in images}.values()
+            _image_positions[folder_id] = {image["id"]: i for i, image in enumerate(images)}
+            # Changes synced while the listing ran may or may not be in it; upserts/removes are idempotent, so replay them
+            for change in pending:
+                _apply_change_to_folder(folder_id, change)
+        elif not replace_when_done and _image_list_cache.get(folder_id) is images:
+            # A first load that died partway: drop the truncated list so the next request lists the folder again
+            del _image_list_cache[folder_id]
+            del _name_index_cache[folder_id]
+            _folder_versions[folder_id] += 1
+    task.add_done_callback(_finish)
+
+    load = _folder_loads[folder_id] = {"first_page": first_page, "task": task}
+    return load
+
+async def _get_images_in_folder(folder_name: str):
+    """Return cached or freshly loaded list of images for a folder (possibly still filling in)."""
+    folder_id = await _get_folder_id(folder_name)
     if not folder_id:
         return []
 
-    if folder_id not in _image_list_cache:
-        _image_list_cache[folder_id] = _load_image_list_for_folder(folder_id)
+    images = _image_list_cache.get(folder_id)
+    if images is not None and folder_id in _image_positions:
+        return images
+    load = _folder_loads.get(folder_id)
+    if images and load and not load["task"].done():
+        return images  # First load still streaming in; what's there is usable already
+
+    load = _start_folder_load(folder_id)
+    await load["first_page"].wait()
+    return _image_list_cache.get(folder_id, [])
+
+def _get_start_page_token() -> str:
+    return get_drive_service().changes().getStartPageToken().execute()["startPageToken"]
+
+def _list_changes_page(page_token: str) -> dict:
+    return get_drive_service().changes().list(
+        pageToken=page_token,
+        fields=f"nextPageToken, newStartPageToken, changes(fileId, removed, file(mimeType, parents, trashed, {IMAGE_FIELDS}))",
+        includeRemoved=True,
+        pageSize=1000,
+        spaces="drive"
+    ).execute()
+
+async def _ensure_changes_token():
+    global _changes_page_token
+    if _changes_page_token is None:
+        _changes_page_token = await _run_blocking(_get_start_page_token)
+
+def _remove_image(folder_id: str, file_id: str) -> bool:
+    positions = _image_positions[folder_id]
+    i = positions.pop(file_id, None)
+    if i is None:
+        return False
+
+    # Swap-remove: order doesn't matter for random picks, and the name index keeps its own order
+    images = _image_list_cache[folder_id]
+    last = images.pop()
+    if i < len(images):
+        images[i] = last
+        positions[last["id"]] = i
+    _name_index_cache[folder_id].remove(file_id)
+    _folder_versions[folder_id] += 1
+    return True
+
+def _upsert_image(folder_id: str, file: dict) -> bool:
+    image = {key: value for key, value in file.items() if key not in ("mimeType", "parents", "trashed")}
+    _remember_thumbnail(image["id"], image.get("thumbnailLink"))
+    images = _image_list_cache[folder_id]
+    positions = _image_positions[folder_id]
+    i = positions.get(image["id"])
+    if i is None:
+        positions[image["id"]] = len(images)
+        images.append(image)
+    elif images[i] == image:
+        return False
+    else:
+        images[i] = image  # e.g. renamed
+    _name_index_cache[folder_id].add(image)
+    _folder_versions[folder_id] += 1
+    return True
+
+def _apply_change_to_folder(folder_id: str, change: dict) -> bool:
+    file = change.get("file") or {}
+    is_image = (
+        not change.get("removed")
+        and not file.get("trashed")
+        and file.get("mimeType", "").startswith("image/")
+    )
+    if is_image and folder_id in file.get("parents", []):
+        return _upsert_image(folder_id, file)
+    # Deleted, trashed, no longer an image, or moved out of this folder
+    return _remove_image(folder_id, change["fileId"])
+
+def _apply_change(change: dict) -> bool:
+    """
+    Apply one entry of the Drive changes feed to every cached folder. Returns True if anything changed.
+    Folders whose listing is still running get the change deferred until it completes.
+    """
+    for pending in _pending_changes.values():
+        pending.append(change)
 
-    return _image_list_cache[folder_id]
+    changed = False
+    for folder_id in _image_positions:
+        changed |= _apply_change_to_folder(folder_id, change)
+    return changed
 
 # --- Access API ---
-def refresh_folder_cache(folder_name: str) -> bool:
+async def sync_image_changes() -> int:
+    """
+    Incrementally sync every cached folder from Drive's changes feed: only additions,
+    removals and renames since the last sync are applied. Returns how many changes applied.
+    """
+    global _changes_page_token
+    if _changes_page_token is None:
+        # Nothing has been listed yet, so there is nothing to bring up to date
+        await _ensure_changes_token()
+        return 0
+
+    applied = 0
+    page_token = _changes_page_token
+    while True:
+        page = await _run_blocking(_list_changes_page, page_token)
+        for change in page.get("changes", []):
+            applied += _apply_change(change)
+
+        if "newStartPageToken" in page:
+            _changes_page_token = page["newStartPageToken"]
+            return applied
+        page_token = page["nextPageToken"]
+
+async def refresh_folder_cache(folder_name: str) -> bool:
     """Manually re-fetch image list for a folder by name."""
-    folder_id = _get_folder_id_by_name(folder_name)
+    folder_id = await _get_folder_id(folder_name)
     if not folder_id:
         return False
 
-    _image_list_cache[folder_id] = _load_image_list_for_folder(folder_id)
-    return True
+    load = _start_folder_load(folder_id, replace_when_done=folder_id in _image_list_cache)
+    return await asyncio.shield(load["task"])
 
-def get_random_image_url(folder_name: str):
-    """Return a random image URL from the specified folder."""
-    images = _get_images_in_folder(folder_name)
+def _remember_thumbnail(file_id: str, link):
+    _thumbnail_links[file_id] = (link, time.monotonic())
+    _thumbnail_links.move_to_end(file_id)
+
+def _get_thumbnail_link(file_id: str):
+    return get_drive_service().files().get(fileId=file_id, fields="thumbnailLink").execute().get("thumbnailLink")
+
+async def _fresh_thumbnail_link(file_id: str):
+    now = time.monotonic()
+    # Entries are in the order they were received, so expired ones are all at the front
+    while _thumbnail_links and now - next(iter(_thumbnail_links.values()))[1] >= THUMBNAIL_LINK_TTL_SECONDS:
+        _thumbnail_links.popitem(last=False)
+
+    cached = _thumbnail_links.get(file_id)
+    if cached:
+        return cached[0]
+    link = await asyncio.get_running_loop().run_in_executor(_thumbnail_executor, _get_thumbnail_link, file_id)
+    _remember_thumbnail(file_id, link)
+    return link
+
+def image_url(image: dict) -> str:
+    """Link to the original image file."""
+    return f"https://drive.google.com/uc?id={image['id']}"
+
+async def sized_image_url(image: dict, size: str = None) -> str:
+    """
+    URL for an image at a size tier (see IMAGE_SIZE_TIERS): Drive's thumbnail of that size when it is
+    smaller than the original. Otherwise, or if no thumbnail can be had, the original file is linked.
+    """
+    target = IMAGE_SIZE_TIERS.get(size)
+    if not target:
+        return image_url(image)
+
+    metadata = image.get("imageMediaMetadata") or {}
+    longest_side = max(metadata.get("width", 0), metadata.get("height", 0))
+    if longest_side and longest_side <= target:
+        return image_url(image)
+
+    try:
+        thumbnail = await _fresh_thumbnail_link(image["id"])
+    except Exception as e:
+        print(f"[GImg] ⚠️ Could not get a thumbnail for {image['id']}: {e}")
+        thumbnail = None
+    if not thumbnail:
+        return image_url(image)
+
+    # Thumbnail links end in a size suffix such as "=s220"
+    if re.search(r"=s\d+$", thumbnail):
+        return re.sub(r"=s\d+$", f"=s{target}", thumbnail)
+    return f"{thumbnail}=s{target}"
+
+async def get_random_image(folder_name: str):
+    """Return a random image (Drive file dict) from the specified folder."""
+    images = await _get_images_in_folder(folder_name)
     if not images:
         return None
+    return random.choice(images)
 
-    chosen = random.choice(images)
-    return f"https://drive.google.com/uc?id={chosen['id']}"
+async def get_random_image_url(folder_name: str, size: str = None):
+    """Return a random image URL from the specified folder."""
+    chosen = await get_random_image(folder_name)
+    if not chosen:
+        return None
+    return await sized_image_url(chosen, size)
 
-def get_named_image_url(folder_name: str, name: str):
-    """Return an image that matches the given name (partial match, case-insensitive)."""
-    images = _get_images_in_folder(folder_name)
-    if not images:
+class WeightedImagePool:
+    """
+    Weighted random picks across several folders (rarity tiers), using an alias table so each
+    draw is O(1). The table is only rebuilt when a folder's cached list or the weights change.
+
+    :param folder_weights: folder name → weight given to each image in that folder
+    :param no_repeat_window: how many of a user's most recent picks they won't get again
+    """
+    MAX_REDRAWS = 8
+    MAX_TRACKED_USERS = 1000  # recent-pick histories kept; the least recently active user's is dropped first
+
+    def __init__(self, folder_weights: dict, no_repeat_window: int = 0):
+        self.folder_weights = dict(folder_weights)
+        self.no_repeat_window = no_repeat_window
+        self._image_weights = {}    # lowercase image name or stem → weight override
+        self._sampler = None
+        self._built_for = None      # signature of the folder versions/weights the sampler was built from
+        self._recent = OrderedDict()  # user_id → (deque of recent file ids, set of the same ids), LRU order
+        self._upcoming = deque()    # picks drawn ahead of time by upcoming(); pick() serves these first
+
+    def set_image_weights(self, image_weights: dict):
+        """Per-image weight overrides (e.g. from a sheet tab), keyed by image name or name without extension."""
+        self._image_weights = {name.strip().lower(): weight for name, weight in image_weights.items()}
+        self._built_for = None
+
+    async def _current_sampler(self) -> AliasSampler:
+        folders = []
+        for folder_name, weight in self.folder_weights.items():
+            await _get_images_in_folder(folder_name)  # Loads (or starts streaming) the folder if needed
+            folder_id = await _get_folder_id(folder_name)
+            if folder_id:
+                folders.append((folder_id, weight))
+
+        signature = tuple((folder_id, _folder_versions[folder_id]) for folder_id, _ in folders)
+        if self._sampler is None or self._built_for != signature:
+            items, weights = [], []
+            for folder_id, folder_weight in folders:
+                for image in _image_list_cache.get(folder_id, []):
+                    name = image["name"].lower()
+                    weight = self._image_weights.get(name, self._image_weights.get(os.path.splitext(name)[0], folder_weight))
+                    items.append(image)
+                    weights.append(weight)
+            self._sampler = AliasSampler(items, weights)
+            self._built_for = signature
+            self._upcoming.clear()  # Drawn from the old pool (may include removed images)
+        return self._sampler
+
+    def _draw(self, sampler: AliasSampler, avoid=frozenset()):
+        for i, image in enumerate(itertools.islice(self._upcoming, self.MAX_REDRAWS)):
+            if image["id"] not in avoid:
+                del self._upcoming[i]
+                return image
+        # Rejection sampling stays O(1) on average while the window is small next to the pool
+        for _ in range(self.MAX_REDRAWS):
+            image = sampler.sample()
+            if image["id"] not in avoid:
+                break
+        return image
+
+    async def upcoming(self, count: int) -> list[dict]:
+        """
+        The next `count` picks, drawn now and queued so pick() hands them out in order.
+        Prefetching these warms exactly the images users are about to get.
+        """
+        sampler = await self._current_sampler()
+        if len(sampler):
+            while len(self._upcoming) < count:
+                self._upcoming.append(sampler.sample())
+        return list(itertools.islice(self._upcoming, count))
+
+    async def pick(self, user_id: int = None):
+        """Draw one image, avoiding the user's last `no_repeat_window` picks when possible."""
+        sampler = await self._current_sampler()
+        if not len(sampler):
+            return None
+        if not self.no_repeat_window or user_id is None:
+            return self._draw(sampler)
+
+        recent_ids, recent_set = self._recent.setdefault(user_id, (deque(), set()))
+        self._recent.move_to_end(user_id)
+        while len(self._recent) > self.MAX_TRACKED_USERS:
+            self._recent.popitem(last=False)
+        image = self._draw(sampler, recent_set)
+
+        recent_ids.append(image["id"])
+        recent_set.add(image["id"])
+        while len(recent_ids) > self.no_repeat_window:
+            recent_set.discard(recent_ids.popleft())
+        return image
+
+def enable_disk_cache(directory: str, max_bytes: int, backend=None):
+    """Keep image bytes in a size-bounded LRU disk cache so they can be sent as attachments."""
+    global _disk_cache
+    _disk_cache = ImageDiskCache(directory, max_bytes, backend=backend)
+
+def disk_cache_enabled() -> bool:
+    return _disk_cache is not None
+
+async def get_image_bytes(image: dict):
+    """Return the image's bytes from the disk cache (downloading on a miss), or None if the cache is off."""
+    if _disk_cache is None:
         return None
+    return await _run_download(_disk_cache.get, image)
+
+async def prefetch_images(images: list[dict]) -> int:
+    """Download any of `images` that aren't on disk yet (e.g. a pool's upcoming picks). Returns how many were fetched."""
+    if _disk_cache is None:
+        return 0
+    return await _run_download(_disk_cache.prefetch, images)
 
-    name = name.strip().lower()
-    for img in images:
-        if name in img['name'].lower():
-            return f"https://drive.google.com/uc?id={img['id']}"
-    return None
\ No newline at end of file
+async def prefetch_popular_images(limit: int = 20) -> int:
+    """Re-download the most requested images that have since been evicted from disk."""
+    if _disk_cache is None:
+        return 0
+    return await _run_download(_disk_cache.prefetch, _disk_cache.popular_uncached(limit))
+
+async def find_named_images(folder_name: str, name: str) -> list[dict]:
+    """Return every image whose name contains `name` (case-insensitive), ranked exact → prefix → substring."""
+    images = await _get_images_in_folder(folder_name)
+    if not images:
+        return []
+
+    folder_id = await _get_folder_id(folder_name)
+    name_index = _name_index_cache.get(folder_id)
+    return name_index.search(name) if name_index else []
+
+async def get_named_image_url(folder_name: str, name: str, size: str = None):
+    """Return the best image that matches the given name (partial match, case-insensitive)."""
+    matches = await find_named_images(folder_name, name)
+    if not matches:
+        return None
+    return await sized_image_url(matches[0], size)
@@ -0,0 +1,66 @@
+import os
+import threading
+import gspread
+import httplib2
+import google_auth_httplib2
+from googleapiclient.discovery import build
+from googleapiclient.http import HttpRequest
+from google.oauth2 import service_account
+
+# One service account credential (and token) shared by every Google-facing module.
+# Full Drive scope covers the read-only/metadata access the image and prefs helpers need.
+SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive",
+]
+SERVICE_ACCOUNT_JSON = os.environ.get("GOOGLE_CREDS_PATH")
+
+_credentials = None
+_drive_service = None
+_gspread_client = None
+_lock = threading.RLock()
+_thread_local = threading.local()
+
+def get_credentials():
+    """Load the service account credentials once; token refreshes are shared by all clients."""
+    global _credentials
+    with _lock:
+        if _credentials is None:
+            if not SERVICE_ACCOUNT_JSON:
+                raise RuntimeError("Missing GOOGLE_CREDS_PATH environment variable.")
+            _credentials = service_account.Credentials.from_service_account_file(
+                SERVICE_ACCOUNT_JSON, scopes=SCOPES
+            )
+    return _credentials
+
+def _authorized_http():
+    # httplib2 isn't thread-safe, so each worker thread keeps one keep-alive connection of its own
+    http = getattr(_thread_local, "http", None)
+    if http is None:
+        http = _thread_local.http = google_auth_httplib2.AuthorizedHttp(get_credentials(), http=httplib2.Http())
+    return http
+
+def _build_request(http, *args, **kwargs):
+    # Requests from the shared service run on whichever thread executes them
+    return HttpRequest(_authorized_http(), *args, **kwargs)
+
+def get_drive_service():
+    """Shared Drive v3 service, built once from the bundled discovery document."""
+    global _drive_service
+    with _lock:
+        if _drive_service is None:
+            _drive_service = build(
+                "drive", "v3",
+                http=_authorized_http(),
+                requestBuilder=_build_request,
+                cache_discovery=False,
+            )
+    return _drive_service
+
+def get_gspread_client():
+    """Shared gspread client (one requests session / connection pool)."""
+    global _gspread_client
+    with _lock:
+        if _gspread_client is None:
+            _gspread_client = gspread.authorize(get_credentials())
+    return _gspread_client
@@ -1,43 +1,241 @@
 import os
+import gzip
+import json
+import time
+import asyncio
+import threading
 import gspread
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from oauth2client.service_account import ServiceAccountCredentials
+from utils import google_clients
 from collections import defaultdict
 
-_sheet_cache = {}
-CREDS_PATH = os.environ.get("GOOGLE_CREDS_PATH")
-SCOPE = [
-    "https://spreadsheets.google.com/feeds",
-    "https://www.googleapis.com/auth/drive"
-]
-# Authenticate using the service account file
-CREDS = ServiceAccountCredentials.from_json_keyfile_name(CREDS_PATH, SCOPE)
-client = gspread.authorize(CREDS)
-
-def _load_from_sheet(sheet_name, tab_name):
+_sheet_cache = {}        # cache_key → parsed table (always the last good copy)
+_cache_stats = {}        # cache_key → {"loaded_at", "version", "hits", "misses", "last_error", "last_error_at"}
+_spreadsheet_cache = {}  # sheet_name → opened gspread Spreadsheet handle
+_inflight_loads = {}     # cache_key → asyncio.Future of the refresh currently running for it
+_sheet_versions = {}     # sheet_name → (checked_at, Drive revision)
+
+# How long a loaded tab counts as fresh. Stale tabs are still served while a background refresh runs.
+DEFAULT_SHEET_TTL_SECONDS = int(os.environ.get("SHEET_CACHE_TTL_SECONDS", 300))
+_tab_ttls = {}  # tab_name → ttl in seconds (overrides the default)
+
+# Refreshes first compare the spreadsheet's Drive revision and skip the download if unchanged.
+# The check is reused briefly so tabs refreshing together share one metadata call.
+VERSION_CHECK_INTERVAL_SECONDS = 10
+
+# Parsed tables are snapshotted locally so a restart can serve commands before Google answers
+SHEET_SNAPSHOT_PATH = os.environ.get("SHEET_SNAPSHOT_PATH", "kringbot_sheets.snapshot")
+SNAPSHOT_VERSION = 1
+_snapshot_lock = threading.Lock()  # guards the two flags below
+_snapshot_pending = False          # a snapshot job is queued or writing (so at most one writer at a time)
+_snapshot_dirty = False            # the cache changed since that job last started writing
+
+# Sheet fetches are blocking gspread calls, so they run on a small, bounded pool
+SHEET_FETCH_WORKERS = 4
+_fetch_executor = ThreadPoolExecutor(max_workers=SHEET_FETCH_WORKERS, thread_name_prefix="gsheet")
+
+def get_client():
+    """The shared gspread client (see utils/google_clients)."""
+    return google_clients.get_gspread_client()
+
+### Cache bookkeeping ###
+def _cache_key(sheet_name: str, tab_name: str) -> str:
+    return f"{sheet_name}:{tab_name}"
+
+def _stats(cache_key: str) -> dict:
+    stats = _cache_stats.get(cache_key)
+    if stats is None:
+        stats = _cache_stats[cache_key] = {
+            "loaded_at": None,
+            "version": None,
+            "hits": 0,
+            "misses": 0,
+            "last_error": None,
+            "last_error_at": None,
+            "from_snapshot": False,
+        }
+    return stats
+
+def _store_table(cache_key: str, table: dict, version: str = None):
+    _sheet_cache[cache_key] = table
+    stats = _stats(cache_key)
+    stats["loaded_at"] = time.time()
+    stats["version"] = version
+    stats["last_error"] = None
+    stats["from_snapshot"] = False
+
+def _mark_unchanged(cache_key: str):
+    # The sheet wasn't edited since the cached copy was fetched, so it counts as freshly loaded
+    stats = _stats(cache_key)
+    stats["loaded_at"] = time.time()
+    stats["last_error"] = None
+
+def _record_error(cache_key: str, error: Exception):
+    stats = _stats(cache_key)
+    stats["last_error"] = repr(error)
+    stats["last_error_at"] = time.time()
+    if cache_key in _sheet_cache:
+        print(f"[WARN] Refresh of '{cache_key}' failed ({error!r}), serving last good copy.")
+    else:
+        print(f"[ERROR] Could not load '{cache_key}': {error!r}")
+
+def set_tab_ttl(tab_name: str, seconds: float):
+    """Set how long a tab is served from cache before it is refreshed in the background."""
+    _tab_ttls[tab_name] = seconds
+
+def _is_stale(cache_key: str, tab_name: str) -> bool:
+    loaded_at = _stats(cache_key)["loaded_at"]
+    ttl = _tab_ttls.get(tab_name, DEFAULT_SHEET_TTL_SECONDS)
+    return loaded_at is None or time.time() - loaded_at > ttl
+
+def _refresh_due(cache_key: str, tab_name: str) -> bool:
+    # A failed refresh also waits one TTL before retrying, so an outage isn't hammered
+    stats = _stats(cache_key)
+    last_attempt = max(stats["loaded_at"] or 0, stats["last_error_at"] or 0)
+    return time.time() - last_attempt > _tab_ttls.get(tab_name, DEFAULT_SHEET_TTL_SECONDS)
+
+def get_cache_stats(sheet_name: str, tab_name: str) -> dict:
+    """Age, hit/miss counts and last refresh error for a cached tab."""
+    cache_key = _cache_key(sheet_name, tab_name)
+    stats = dict(_stats(cache_key))
+    stats["age"] = time.time() - stats["loaded_at"] if stats["loaded_at"] else None
+    stats["ttl"] = _tab_ttls.get(tab_name, DEFAULT_SHEET_TTL_SECONDS)
+    stats["stale"] = _is_stale(cache_key, tab_name)
+    stats["refreshing"] = cache_key in _inflight_loads
+    return stats
+
+### Local snapshot ###
+def save_snapshot(path: str = None):
+    """Write every cached table, with the time it was fetched, to a gzipped JSON snapshot."""
+    path = path or SHEET_SNAPSHOT_PATH
+    tables = {}
+    for cache_key, table in list(_sheet_cache.items()):
+        tables[cache_key] = {
+            "loaded_at": _stats(cache_key)["loaded_at"],
+            "version": _stats(cache_key)["version"],
+            # JSON has no tuple keys, so multi-key rows are stored as [key list, values]
+            "rows": [[list(key) if isinstance(key, tuple) else key, values] for key, values in list(table.items())],
+        }
+    payload = {"version": SNAPSHOT_VERSION, "saved_at": time.time(), "tables": tables}
+
+    # Per-writer temp file, so a concurrent save can never interleave with this one before the atomic replace
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
     try:
-        sheet = client.open(sheet_name)
-        return sheet.worksheet(tab_name)
-    except gspread.exceptions.WorksheetNotFound:
-        print(f"[ERROR] Worksheet '{tab_name}' not found in Google Sheet: {sheet_name}")
-        return None
-    except gspread.exceptions.SpreadsheetNotFound:
-        print(f"[ERROR] Sheet '{sheet_name}' not found in Google Drive!")
+        with open(tmp_path, "wb") as f:
+            f.write(gzip.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8")))
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"[GSheet] ❌ Failed to save snapshot: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+def load_snapshot(path: str = None) -> bool:
+    """
+    Fill the cache from a local snapshot without touching the network.
+    Each table keeps its original fetch time, so it shows up as stale and is refreshed in the background.
+    """
+    path = path or SHEET_SNAPSHOT_PATH
+    if not os.path.exists(path):
+        print(f"[GSheet] ⚠️ No sheet snapshot at {path}, first loads will hit Google.")
+        return False
+
+    try:
+        with open(path, "rb") as f:
+            payload = json.loads(gzip.decompress(f.read()).decode("utf-8"))
+        if payload.get("version") != SNAPSHOT_VERSION:
+            print(f"[GSheet] ⚠️ Ignoring snapshot with unknown version {payload.get('version')}.")
+            return False
+
+        for cache_key, entry in payload["tables"].items():
+            table = defaultdict(list)
+            for key, values in entry["rows"]:
+                table[tuple(key) if isinstance(key, list) else key] = values
+            _sheet_cache[cache_key] = table
+            stats = _stats(cache_key)
+            stats["loaded_at"] = entry.get("loaded_at")
+            stats["version"] = entry.get("version")
+            stats["from_snapshot"] = True
+
+        saved_at = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(payload["saved_at"]))
+        print(f"[GSheet] ✅ Loaded {len(payload['tables'])} cached tabs from snapshot (saved {saved_at}).")
+        return True
+    except Exception as e:
+        print(f"[GSheet] ❌ Failed to load snapshot: {e}")
+        return False
+
+def _write_scheduled_snapshots():
+    global _snapshot_pending, _snapshot_dirty
+    while True:
+        with _snapshot_lock:
+            _snapshot_dirty = False
+        try:
+            save_snapshot()
+        except Exception as e:
+            print(f"[GSheet] ❌ Failed to save snapshot: {e}")
+        with _snapshot_lock:
+            # Stay the only writer until nothing changed during the write; otherwise write again
+            if not _snapshot_dirty:
+                _snapshot_pending = False
+                return
+
+def _schedule_snapshot():
+    """
+    Save a snapshot on the fetch pool, merging bursts of loads into one write.
+    Every snapshot write goes through here, so there is never more than one writer. Callable from any thread.
+    """
+    global _snapshot_pending, _snapshot_dirty
+    with _snapshot_lock:
+        _snapshot_dirty = True
+        if _snapshot_pending:
+            return
+        _snapshot_pending = True
+    _fetch_executor.submit(_write_scheduled_snapshots)
+
+def _open_spreadsheet(sheet_name):
+    """Open a spreadsheet by name, reusing the handle from earlier loads."""
+    spreadsheet = _spreadsheet_cache.get(sheet_name)
+    if spreadsheet is None:
+        spreadsheet = get_client().open(sheet_name)
+        _spreadsheet_cache[sheet_name] = spreadsheet
+    return spreadsheet
+
+def _get_sheet_version(sheet_name: str):
+    """
+    Drive revision of the spreadsheet (one cheap files.get metadata call), or None if it can't be checked.
+    The revision number is used when Drive reports it, otherwise modifiedTime.
+    """
+    cached = _sheet_versions.get(sheet_name)
+    if cached and time.time() - cached[0] < VERSION_CHECK_INTERVAL_SECONDS:
+        return cached[1]
+
+    try:
+        file_id = _open_spreadsheet(sheet_name).id
+        metadata = google_clients.get_drive_service().files().get(
+            fileId=file_id, fields="version, modifiedTime"
+        ).execute()
+    except Exception as e:
+        print(f"[WARN] Could not check '{sheet_name}' for changes ({e!r}), downloading anyway.")
         return None
 
-def load_generic_table(sheet_name: str, tab_name: str, num_key_columns: int = 1, num_value_columns: int = None) -> dict:
-    """Load a table from any sheet and tab dynamically."""
-    # If it's already cached, return it.
-    cache_key = f"{sheet_name}:{tab_name}"
-    # if cache_key in _sheet_cache and _sheet_cache[cache_key]:
-    #     return _sheet_cache[cache_key]
-
-    # If not cached, load from the sheet.
-    worksheet = _load_from_sheet(sheet_name, tab_name)
-    if not worksheet:
-        return {}
+    version = metadata.get("version") or metadata.get("modifiedTime")
+    _sheet_versions[sheet_name] = (time.time(), version)
+    return version
 
+def _fetch_table(sheet_name: str, tab_name: str, num_key_columns: int = 1, num_value_columns: int = None) -> dict:
+    """Download and parse one tab. Raises gspread errors instead of swallowing them."""
+    try:
+        worksheet = _open_spreadsheet(sheet_name).worksheet(tab_name)
+    except gspread.exceptions.SpreadsheetNotFound:
+        _spreadsheet_cache.pop(sheet_name, None)
+        raise
     rows = worksheet.get_all_values()[1:]  # Skip the header row.
+    return _parse_table(rows, num_key_columns, num_value_columns)
+
+def _parse_table(rows: list, num_key_columns: int = 1, num_value_columns: int = None) -> dict:
+    """Turn sheet rows (header excluded) into the key → values shape used by the caches."""
     result = defaultdict(list)
 
     for row in rows:
@@ -58,13 +256,226 @@ def load_generic_table(sheet_name: str, tab_name: str, num_key_columns: int = 1,
         else:
             result[keys] = values  # Multi-key → multi-value
 
-    _sheet_cache[cache_key] = result  # Store in cache
     return result
 
+def load_generic_table(sheet_name: str, tab_name: str, num_key_columns: int = 1, num_value_columns: int = None) -> dict:
+    """Load a table from any sheet and tab dynamically."""
+    try:
+        result = _fetch_table(sheet_name, tab_name, num_key_columns, num_value_columns)
+    except gspread.exceptions.WorksheetNotFound:
+        print(f"[ERROR] Worksheet '{tab_name}' not found in Google Sheet: {sheet_name}")
+        return {}
+    except gspread.exceptions.SpreadsheetNotFound:
+        print(f"[ERROR] Sheet '{sheet_name}' not found in Google Drive!")
+        return {}
+
+    _store_table(_cache_key(sheet_name, tab_name), result)  # Store in cache
+    _schedule_snapshot()
+    return result
+
+def _quote_tab(tab_name: str) -> str:
+    """A1 range that selects a whole tab."""
+    return "'" + tab_name.replace("'", "''") + "'"
+
+def _fetch_tables(sheet_name: str, tab_specs: dict) -> tuple[dict, dict]:
+    """
+    Download and parse several tabs in one values batch-get.
+    Returns (tab name → table, tab name → error) for the tabs that could not be fetched.
+    """
+    try:
+        spreadsheet = _open_spreadsheet(sheet_name)
+    except gspread.exceptions.SpreadsheetNotFound:
+        _spreadsheet_cache.pop(sheet_name, None)
+        raise
+
+    try:
+        response = spreadsheet.values_batch_get([_quote_tab(tab_name) for tab_name in tab_specs])
+    except gspread.exceptions.APIError as e:
+        # A single missing tab fails the whole batch, so fall back to loading tabs one by one
+        print(f"[WARN] Batch load of '{sheet_name}' failed ({e}), loading tabs individually.")
+        tables, errors = {}, {}
+        for tab_name, (num_key_columns, num_value_columns) in tab_specs.items():
+            try:
+                tables[tab_name] = _fetch_table(sheet_name, tab_name, num_key_columns, num_value_columns)
+            except Exception as tab_error:
+                errors[tab_name] = tab_error
+        return tables, errors
+
+    tables = {}
+    value_ranges = response.get("valueRanges", [])
+    for (tab_name, (num_key_columns, num_value_columns)), value_range in zip(tab_specs.items(), value_ranges):
+        rows = value_range.get("values", [])
+        # The values API trims trailing empty cells; pad like get_all_values() does
+        width = max((len(row) for row in rows), default=0)
+        rows = [row + [""] * (width - len(row)) for row in rows[1:]]  # Skip the header row.
+        tables[tab_name] = _parse_table(rows, num_key_columns, num_value_columns)
+    return tables, {}
+
+def _fetch_table_if_changed(sheet_name: str, tab_name: str, num_key_columns: int, num_value_columns: int, known_version: str):
+    """Returns (table, version); table is None when the sheet hasn't changed since `known_version`."""
+    version = _get_sheet_version(sheet_name)
+    if version is not None and version == known_version:
+        return None, version
+    return _fetch_table(sheet_name, tab_name, num_key_columns, num_value_columns), version
+
+def _fetch_tables_if_changed(sheet_name: str, tab_specs: dict, known_versions: dict):
+    """
+    Returns (tables, errors, version) like `_fetch_tables`. Tabs whose cached copy
+    is already at the current version are in neither dict and were not downloaded.
+    """
+    version = _get_sheet_version(sheet_name)
+    changed_specs = {
+        tab_name: spec for tab_name, spec in tab_specs.items()
+        if version is None or known_versions.get(tab_name) != version
+    }
+    if not changed_specs:
+        return {}, {}, version
+    tables, errors = _fetch_tables(sheet_name, changed_specs)
+    return tables, errors, version
+
+def load_generic_tables(sheet_name: str, tab_specs: dict) -> dict:
+    """
+    Load several tabs of one sheet in a single values batch-get.
+
+    :param tab_specs: tab name → (num_key_columns, num_value_columns), same meaning as in `load_generic_table`
+    :return: tab name → parsed table (same shape as `load_generic_table`)
+    """
+    try:
+        tables, errors = _fetch_tables(sheet_name, tab_specs)
+    except gspread.exceptions.SpreadsheetNotFound:
+        print(f"[ERROR] Sheet '{sheet_name}' not found in Google Drive!")
+        return {tab_name: {} for tab_name in tab_specs}
+
+    for tab_name, error in errors.items():
+        print(f"[ERROR] Could not load worksheet '{tab_name}' from Google Sheet {sheet_name}: {error!r}")
+    for tab_name, table in tables.items():
+        _store_table(_cache_key(sheet_name, tab_name), table)
+    if tables:
+        _schedule_snapshot()
+    return {tab_name: tables.get(tab_name, {}) for tab_name in tab_specs}
+
 def try_get_from_cache(sheet_name: str, tab_name: str, num_key_columns: int = 1, num_value_columns: int = None, force: bool = False):
-    cache_key = f"{sheet_name}:{tab_name}"
+    cache_key = _cache_key(sheet_name, tab_name)
     # Check if the cache is already populated
-    if force or cache_key not in _sheet_cache or not _sheet_cache[cache_key]:
-        # Load data if cache is empty or force refresh
-        _sheet_cache[cache_key] = load_generic_table(sheet_name, tab_name, num_key_columns, num_value_columns)
-    return _sheet_cache[cache_key]
+    if force or not _sheet_cache.get(cache_key):
+        # Load data if cache is empty or force refresh (a failed load keeps the last good copy)
+        load_generic_table(sheet_name, tab_name, num_key_columns, num_value_columns)
+    return _sheet_cache.get(cache_key, {})
+
+
+### Async API ###
+def _track_inflight(cache_key: str, future):
+    _inflight_loads[cache_key] = future
+
+    def _clear(done):
+        if _inflight_loads.get(cache_key) is done:
+            del _inflight_loads[cache_key]
+    future.add_done_callback(_clear)
+    return future
+
+async def _refresh_table(sheet_name: str, tab_name: str, num_key_columns: int, num_value_columns: int) -> dict:
+    """Fetch one tab on the pool and update the cache; on failure keep serving the last good copy."""
+    cache_key = _cache_key(sheet_name, tab_name)
+    known_version = _stats(cache_key)["version"] if cache_key in _sheet_cache else None
+    loop = asyncio.get_running_loop()
+    try:
+        table, version = await loop.run_in_executor(
+            _fetch_executor, _fetch_table_if_changed, sheet_name, tab_name, num_key_columns, num_value_columns, known_version
+        )
+    except Exception as e:
+        _record_error(cache_key, e)
+        return _sheet_cache.get(cache_key, {})
+
+    if table is None:
+        _mark_unchanged(cache_key)
+        return _sheet_cache[cache_key]
+
+    _store_table(cache_key, table, version)
+    _schedule_snapshot()
+    return table
+
+async def try_get_from_cache_async(sheet_name: str, tab_name: str, num_key_columns: int = 1, num_value_columns: int = None, force: bool = False):
+    """
+    Non-blocking `try_get_from_cache`.
+
+    A cached tab is always returned immediately; if it is older than its TTL a
+    background refresh is started. Only a cold miss (or `force`) waits on Google,
+    and concurrent waiters for the same `sheet:tab` share one in-flight fetch.
+    """
+    cache_key = _cache_key(sheet_name, tab_name)
+    stats = _stats(cache_key)
+
+    if not force and cache_key in _sheet_cache:
+        stats["hits"] += 1
+        if _refresh_due(cache_key, tab_name) and cache_key not in _inflight_loads:
+            _track_inflight(cache_key, asyncio.ensure_future(
+                _refresh_table(sheet_name, tab_name, num_key_columns, num_value_columns)
+            ))
+        return _sheet_cache[cache_key]
+
+    stats["misses"] += 1
+    future = _inflight_loads.get(cache_key)
+    if future is None:
+        future = _track_inflight(cache_key, asyncio.ensure_future(
+            _refresh_table(sheet_name, tab_name, num_key_columns, num_value_columns)
+        ))
+    # Shield so one cancelled caller doesn't cancel the fetch for everyone else
+    return await asyncio.shield(future)
+
+async def _refresh_tables(sheet_name: str, tab_specs: dict) -> dict:
+    known_versions = {
+        tab_name: _stats(_cache_key(sheet_name, tab_name))["version"]
+        for tab_name in tab_specs if _cache_key(sheet_name, tab_name) in _sheet_cache
+    }
+    loop = asyncio.get_running_loop()
+    try:
+        tables, errors, version = await loop.run_in_executor(
+            _fetch_executor, _fetch_tables_if_changed, sheet_name, tab_specs, known_versions
+        )
+    except Exception as e:
+        tables, errors, version = {}, dict.fromkeys(tab_specs, e), None
+
+    results = {}
+    for tab_name in tab_specs:
+        cache_key = _cache_key(sheet_name, tab_name)
+        if tab_name in tables:
+            _store_table(cache_key, tables[tab_name], version)
+        elif tab_name in errors:
+            _record_error(cache_key, errors[tab_name])
+        else:
+            _mark_unchanged(cache_key)
+        results[tab_name] = _sheet_cache.get(cache_key, {})
+    if tables:
+        _schedule_snapshot()
+    return results
+
+async def load_tables_async(sheet_name: str, tab_specs: dict) -> dict:
+    """
+    Non-blocking `load_generic_tables`: every tab is fetched in one batch request.
+    Concurrent single-tab loads of the same tabs join this batch instead of fetching again.
+    """
+    loop = asyncio.get_running_loop()
+    batch = asyncio.ensure_future(_refresh_tables(sheet_name, tab_specs))
+
+    for tab_name in tab_specs:
+        cache_key = _cache_key(sheet_name, tab_name)
+        if cache_key in _inflight_loads:
+            continue
+        tab_future = loop.create_future()
+
+        def _resolve(done, tab_name=tab_name, tab_future=tab_future, cache_key=cache_key):
+            # Always settle the per-tab future, so joined loads never hang and nothing is left unretrieved
+            if tab_future.done():
+                return
+            if done.cancelled():
+                tab_future.cancel()
+            elif done.exception() is not None:
+                tab_future.set_result(_sheet_cache.get(cache_key, {}))
+            else:
+                tab_future.set_result(done.result().get(tab_name, {}))
+        batch.add_done_callback(_resolve)
+        _track_inflight(cache_key, tab_future)
+
+    # If our caller is cancelled the shielded batch runs on; make sure its exception is still retrieved
+    batch.add_done_callback(lambda done: done.cancelled() or done.exception())
+    return await asyncio.shield(batch)
@@ -0,0 +1,145 @@
+import io
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+
+class DriveImageBackend:
+    """Downloads image bytes from Drive. Anything with the same `fetch(file_id)` method can stand in for it (e.g. a fake in tests)."""
+    def fetch(self, file_id: str) -> bytes:
+        # Imported here so the cache itself works (and is testable) without the Google client libraries
+        from googleapiclient.http import MediaIoBaseDownload
+        from utils import google_clients
+
+        request = google_clients.get_drive_service().files().get_media(fileId=file_id)
+        buffer = io.BytesIO()
+        downloader = MediaIoBaseDownload(buffer, request)
+        done = False
+        while not done:
+            status, done = downloader.next_chunk()
+        return buffer.getvalue()
+
+class ImageDiskCache:
+    """
+    Size-bounded LRU cache of image bytes on disk, content-addressed by Drive file ID + md5Checksum,
+    so an edited image gets a new entry and the stale one simply ages out.
+
+    Thread-safe: `get` is meant to be called from worker threads.
+    """
+    def __init__(self, directory: str, max_bytes: int, backend=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.backend = backend or DriveImageBackend()
+
+        self._entries = OrderedDict()      # cache key → size in bytes (least recently used first)
+        self._total_bytes = 0
+        self._request_counts = Counter()   # cache key → times requested
+        self._known_images = {}            # cache key → image dict (for prefetching)
+        self._lock = threading.Lock()
+        self._scan()
+
+    @staticmethod
+    def _cache_key(image: dict) -> str:
+        file_id = re.sub(r"[^A-Za-z0-9_-]", "_", image["id"])
+        return f"{file_id}.{image.get('md5Checksum') or 'nomd5'}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def _scan(self):
+        """Rebuild the LRU from whatever a previous run left on disk (oldest mtime first)."""
+        os.makedirs(self.directory, exist_ok=True)
+        found = []
+        for name in os.listdir(self.directory):
+            path = self._path(name)
+            if name.endswith(".tmp") or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            found.append((stat.st_mtime, name, stat.st_size))
+
+        with self._lock:
+            for _, name, size in sorted(found):
+                self._entries[name] = size
+                self._total_bytes += size
+            self._evict_locked()
+
+    def _evict_locked(self):
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def __contains__(self, image: dict) -> bool:
+        return self._cache_key(image) in self._entries
+
+    def _read(self, key: str):
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except OSError:
+            with self._lock:
+                size = self._entries.pop(key, None)
+                if size is not None:
+                    self._total_bytes -= size
+            return None
+
+    def _store(self, key: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        tmp_path = f"{self._path(key)}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self._path(key))
+
+        with self._lock:
+            old_size = self._entries.pop(key, None)
+            if old_size is not None:
+                self._total_bytes -= old_size
+            self._entries[key] = len(data)
+            self._total_bytes += len(data)
+            self._evict_locked()
+
+    def get(self, image: dict, count_request: bool = True) -> bytes:
+        """Return the image's bytes, downloading them through the backend on a miss."""
+        key = self._cache_key(image)
+        with self._lock:
+            if count_request:
+                self._request_counts[key] += 1
+            self._known_images[key] = image
+            hit = key in self._entries
+            if hit:
+                self._entries.move_to_end(key)
+
+        if hit:
+            data = self._read(key)
+            if data is not None:
+                return data
+
+        data = self.backend.fetch(image["id"])
+        self._store(key, data)
+        return data
+
+    def popular_uncached(self, limit: int) -> list[dict]:
+        """The most requested images that are not on disk right now (e.g. evicted)."""
+        with self._lock:
+            ranked = self._request_counts.most_common()
+            return [
+                self._known_images[key] for key, _ in ranked
+                if key not in self._entries and key in self._known_images
+            ][:limit]
+
+    def prefetch(self, images: list[dict]) -> int:
+        """Download any of `images` that aren't cached yet. Returns how many were fetched."""
+        fetched = 0
+        for image in images:
+            if image in self:
+                continue
+            try:
+                self.get(image, count_request=False)
+                fetched += 1
+            except Exception as e:
+                print(f"[ImgCache] ⚠️ Prefetch of {image.get('id')} failed: {e}")
+        return fetched
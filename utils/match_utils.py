@@ -0,0 +1,84 @@
+from collections import deque
+
+class PhraseMatcher:
+    """
+    Multi-pattern matcher (Aho–Corasick automaton) over any sequence of symbols.
+
+    Patterns are sequences of hashable symbols: a list of words for phrase
+    matching, or a plain string for character-level substring matching.
+    After `build()`, one pass over the input finds every pattern that occurs in it.
+
+    Example:
+        m = PhraseMatcher()
+        m.add(["when", "will", "i"], "timing")
+        m.add(["will", "i"], "yesno")
+        m.build()
+        m.find_all(["when", "will", "i", "sleep"])  # → {0, 1}
+    """
+    def __init__(self):
+        self._goto = [{}]        # state → {symbol: next_state}
+        self._fail = [0]         # state → fallback state
+        self._out = [[]]         # state → pattern ids ending here (incl. via fail links)
+        self.payloads = []       # pattern id → payload passed to add()
+        self._always = []        # ids of empty patterns (they match any input)
+        self._built = False
+
+    def __len__(self):
+        return len(self.payloads)
+
+    def add(self, pattern, payload=None) -> int:
+        """Register a pattern and return its id (ids are assigned in insertion order)."""
+        if self._built:
+            raise RuntimeError("Cannot add patterns after build()")
+
+        pattern_id = len(self.payloads)
+        self.payloads.append(payload)
+        if not pattern:
+            self._always.append(pattern_id)
+            return pattern_id
+
+        state = 0
+        for symbol in pattern:
+            nxt = self._goto[state].get(symbol)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][symbol] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append(pattern_id)
+        return pattern_id
+
+    def build(self):
+        """Compute failure links (breadth-first) so matching is a single pass."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for symbol, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and symbol not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(symbol, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                # Inherit matches of the longest proper suffix
+                self._out[nxt].extend(self._out[self._fail[nxt]])
+        self._built = True
+        return self
+
+    def find_all(self, sequence) -> set:
+        """Return the ids of every pattern occurring (contiguously) in `sequence`."""
+        if not self._built:
+            self.build()
+
+        found = set(self._always)
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for symbol in sequence:
+            while state and symbol not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(symbol, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
@@ -0,0 +1,58 @@
+import discord
+
+class BasePaginator(discord.ui.View):
+    """
+    Previous / Next / Close buttons over numbered pages, usable only by the member who ran the command.
+    By default the pages are a list of description strings; subclasses can override `page_count` and
+    `page_description` to build pages on demand instead.
+    """
+    def __init__(self, pages, author_id, title_prefix="Messages", emoji="", color=discord.Color.blurple()):
+        super().__init__(timeout=120)
+        self.pages = pages
+        self.current = 0
+        self.author_id = author_id
+        self.title_prefix = title_prefix
+        self.emoji = emoji
+        self.color = color
+        self.update_buttons()
+
+    def page_count(self):
+        return len(self.pages)
+
+    def update_buttons(self):
+        # The page count can shrink while the view is open (e.g. live data), so keep the page in range
+        self.current = max(0, min(self.current, self.page_count() - 1))
+        self.children[0].disabled = self.current == 0
+        self.children[1].disabled = self.current >= self.page_count() - 1
+
+    @discord.ui.button(label="⬅️ Previous", style=discord.ButtonStyle.primary)
+    async def go_prev(self, button, interaction):
+        self.current -= 1
+        self.update_buttons()
+        await interaction.response.edit_message(embed=self.make_embed(), view=self)
+
+    @discord.ui.button(label="Next ➡️", style=discord.ButtonStyle.primary)
+    async def go_next(self, button, interaction):
+        self.current += 1
+        self.update_buttons()
+        await interaction.response.edit_message(embed=self.make_embed(), view=self)
+
+    @discord.ui.button(label="❌ Close", style=discord.ButtonStyle.danger, row=1)
+    async def close(self, button, interaction):
+        await interaction.message.delete()
+
+    def page_description(self):
+        return self.pages[self.current]
+
+    def make_embed(self):
+        return discord.Embed(
+            title=f"{self.emoji} {self.title_prefix} (Page {self.current+1}/{self.page_count()})",
+            description=self.page_description(),
+            color=self.color
+        )
+
+    async def interaction_check(self, interaction):
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message("Not your command!", ephemeral=True)
+            return False
+        return True
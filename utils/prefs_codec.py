@@ -0,0 +1,146 @@
+import json
+import re
+import struct
+import zlib
+
+# Compact prefs snapshot:
+#   header: MAGIC + struct "<B" format version
+#   body (zlib): varint namespace count, then per namespace
+#     kind byte (0 = plain string keys, 1 = "<prefix><integer id>" keys), varint-length prefix,
+#     varint entry count, and per entry: the key (varint id or varint-length string), a type tag, the payload.
+# Balances and other plain ints become zigzag varints instead of {"value": 800, "time_based": false, "saved_at": null}.
+MAGIC = b"KBPF"
+FORMAT_VERSION = 1
+
+_KIND_STRING_KEYS = 0
+_KIND_INT_KEYS = 1
+
+_TAG_INT = 0         # plain int value
+_TAG_BOOL = 1        # plain bool value, one byte
+_TAG_TIMED = 2       # time-based: "<dd" value, saved_at
+_TAG_JSON = 3        # any other plain value, as JSON
+_TAG_ENTRY = 4       # an entry that fits none of the above, whole, as JSON
+
+# "ktoken_balance_186860864219906048" → ("ktoken_balance_", "186860864219906048"); no leading zeros so ids round-trip
+_INT_KEY = re.compile(r"^(.*?)(0|[1-9][0-9]*)\Z", re.DOTALL)
+
+def is_compact(data: bytes) -> bool:
+    return data[:len(MAGIC)] == MAGIC
+
+### Varints ###
+def _write_varint(out: bytearray, n: int):
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return
+
+def _read_varint(data: bytes, pos: int):
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+def _write_str(out: bytearray, text: str):
+    raw = text.encode("utf-8")
+    _write_varint(out, len(raw))
+    out += raw
+
+def _read_str(data: bytes, pos: int):
+    length, pos = _read_varint(data, pos)
+    return data[pos:pos + length].decode("utf-8"), pos + length
+
+### Entries ###
+def _write_entry(out: bytearray, entry: dict):
+    value = entry.get("value")
+    if entry.get("time_based") and isinstance(value, (int, float)) and isinstance(entry.get("saved_at"), (int, float)):
+        out.append(_TAG_TIMED)
+        out += struct.pack("<dd", value, entry["saved_at"])
+    elif entry.get("time_based") or entry.get("saved_at") is not None or set(entry) - {"value", "time_based", "saved_at"}:
+        out.append(_TAG_ENTRY)
+        _write_str(out, json.dumps(entry, separators=(",", ":")))
+    elif isinstance(value, bool):
+        out.append(_TAG_BOOL)
+        out.append(int(value))
+    elif isinstance(value, int):
+        out.append(_TAG_INT)
+        _write_varint(out, value * 2 if value >= 0 else -value * 2 - 1)  # zigzag
+    else:
+        out.append(_TAG_JSON)
+        _write_str(out, json.dumps(value, separators=(",", ":")))
+
+def _read_entry(data: bytes, pos: int):
+    tag = data[pos]
+    pos += 1
+    if tag == _TAG_INT:
+        n, pos = _read_varint(data, pos)
+        return {"value": n >> 1 if not n & 1 else -((n + 1) >> 1), "time_based": False, "saved_at": None}, pos
+    if tag == _TAG_BOOL:
+        return {"value": bool(data[pos]), "time_based": False, "saved_at": None}, pos + 1
+    if tag == _TAG_TIMED:
+        value, saved_at = struct.unpack_from("<dd", data, pos)
+        return {"value": value, "time_based": True, "saved_at": saved_at}, pos + 16
+    if tag == _TAG_JSON:
+        text, pos = _read_str(data, pos)
+        return {"value": json.loads(text), "time_based": False, "saved_at": None}, pos
+    if tag == _TAG_ENTRY:
+        text, pos = _read_str(data, pos)
+        return json.loads(text), pos
+    raise ValueError(f"Unknown prefs entry tag {tag}")
+
+### Snapshot ###
+def encode(entries: dict, level: int = 6) -> bytes:
+    """Encode a prefs dict (key → entry) into the compact snapshot format."""
+    namespaces = {}  # (kind, prefix) → [(key or id, entry)]
+    for key, entry in entries.items():
+        match = _INT_KEY.match(key)
+        if match:
+            namespaces.setdefault((_KIND_INT_KEYS, match.group(1)), []).append((int(match.group(2)), entry))
+        else:
+            namespaces.setdefault((_KIND_STRING_KEYS, ""), []).append((key, entry))
+
+    body = bytearray()
+    _write_varint(body, len(namespaces))
+    for (kind, prefix), items in namespaces.items():
+        body.append(kind)
+        _write_str(body, prefix)
+        _write_varint(body, len(items))
+        for key, entry in items:
+            if kind == _KIND_INT_KEYS:
+                _write_varint(body, key)
+            else:
+                _write_str(body, key)
+            _write_entry(body, entry)
+
+    return MAGIC + struct.pack("<B", FORMAT_VERSION) + zlib.compress(bytes(body), level)
+
+def decode(data: bytes) -> dict:
+    """Decode a compact snapshot back into a prefs dict (key → entry)."""
+    if not is_compact(data):
+        raise ValueError("Not a compact prefs snapshot")
+    (version,) = struct.unpack_from("<B", data, len(MAGIC))
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported prefs snapshot version {version}")
+
+    body = zlib.decompress(data[len(MAGIC) + 1:])
+    entries = {}
+    namespace_count, pos = _read_varint(body, 0)
+    for _ in range(namespace_count):
+        kind = body[pos]
+        prefix, pos = _read_str(body, pos + 1)
+        count, pos = _read_varint(body, pos)
+        for _ in range(count):
+            if kind == _KIND_INT_KEYS:
+                key_id, pos = _read_varint(body, pos)
+                key = f"{prefix}{key_id}"
+            else:
+                key, pos = _read_str(body, pos)
+            entries[key], pos = _read_entry(body, pos)
+    return entries
@@ -0,0 +1,94 @@
+from collections.abc import MutableMapping
+
+class CowSnapshot:
+    """
+    Point-in-time view handed out by `CowDict.snapshot()`; safe to read from any thread.
+    The copy is shallow: values are shared with the live dict, so they must be replaced, never mutated in place.
+    """
+    def __init__(self, pages: tuple, size: int):
+        self._pages = pages
+        self._size = size
+
+    def __len__(self):
+        return self._size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Nothing to release; here so callers can treat every store's snapshot alike."""
+
+    def items(self):
+        for page in self._pages:
+            yield from page.items()
+
+class CowDict(MutableMapping):
+    """
+    Dict split into hash-partitioned pages with copy-on-write snapshots.
+
+    `snapshot()` is O(pages): it just bumps the generation and hands out the current page dicts. The first
+    write to a page after that copies the page (1/page_count of the data) and mutates the copy, so the
+    pages a snapshot holds are never touched again and it can be serialized from another thread while
+    the live dict keeps changing.
+
+    Example:
+        store = CowDict({"a": 1})
+        view = store.snapshot()
+        store["a"] = 2
+        dict(view.items())  # → {"a": 1}
+    """
+    def __init__(self, entries=None, page_count: int = 64):
+        self._pages = [{} for _ in range(page_count)]
+        self._page_generations = [0] * page_count  # generation in which each page was last copied
+        self._generation = 0
+        self._size = 0
+        if entries:
+            for key, value in entries.items():
+                self[key] = value
+
+    def _page(self, key) -> dict:
+        return self._pages[hash(key) % len(self._pages)]
+
+    def _writable_page(self, key) -> dict:
+        index = hash(key) % len(self._pages)
+        if self._page_generations[index] != self._generation:
+            # A snapshot may share this page: copy it before the first write
+            self._pages[index] = dict(self._pages[index])
+            self._page_generations[index] = self._generation
+        return self._pages[index]
+
+    def snapshot(self) -> CowSnapshot:
+        self._generation += 1
+        return CowSnapshot(tuple(self._pages), self._size)
+
+    def __getitem__(self, key):
+        return self._page(key)[key]
+
+    def get(self, key, default=None):
+        return self._page(key).get(key, default)
+
+    def __contains__(self, key):
+        return key in self._page(key)
+
+    def __setitem__(self, key, value):
+        page = self._writable_page(key)
+        if key not in page:
+            self._size += 1
+        page[key] = value
+
+    def __delitem__(self, key):
+        page = self._page(key)
+        if key not in page:
+            raise KeyError(key)
+        del self._writable_page(key)[key]
+        self._size -= 1
+
+    def __iter__(self):
+        for page in self._pages:
+            yield from list(page)
+
+    def __len__(self):
+        return self._size
@@ -0,0 +1,238 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+_MISSING = object()
+
+class SQLiteSnapshot:
+    """
+    Point-in-time view of the database: a read transaction on its own connection. In WAL mode it keeps
+    seeing the data as of its first read while the store goes on committing writes.
+
+    The transaction holds back WAL checkpoints until it ends, so close it (or use it as a context manager);
+    `items()` closes it once fully read.
+    """
+    def __init__(self, db_path: str):
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("BEGIN")
+        # The read snapshot is fixed by the first read, so take it now rather than when items() runs
+        self._size = self._conn.execute("SELECT COUNT(*) FROM prefs").fetchone()[0]
+
+    def __len__(self):
+        return self._size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __del__(self):
+        self.close()  # A snapshot nobody read must not pin the WAL forever
+
+    def close(self):
+        conn, self._conn = getattr(self, "_conn", None), None
+        if conn is None:
+            return
+        try:
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def items(self):
+        try:
+            for key, value, time_based, saved_at in self._conn.execute("SELECT key, value, time_based, saved_at FROM prefs"):
+                yield key, SQLitePrefsStore._from_row(value, time_based, saved_at)
+        finally:
+            self.close()
+
+class SQLitePrefsStore(MutableMapping):
+    """
+    SQLite-backed drop-in for bot_prefs' `_store` dict (key → {"value", "time_based", "saved_at"}).
+
+    - Writes are buffered and committed in batches: once `batch_size` are pending, once the oldest has waited
+      `max_delay` seconds (checked on the next write), or on `flush()`.
+    - Reads go through a small LRU of hot keys (misses included) before touching the database.
+    - `keys_with_prefix` is a range scan on the primary key, so "all ktoken_balance_*" never scans the table.
+
+    Thread-safe, so a background thread can flush or export while the bot keeps writing.
+    """
+    def __init__(self, db_path: str, cache_size: int = 4096, batch_size: int = 500, max_delay: float = 2.0):
+        self.db_path = db_path
+        self.cache_size = cache_size
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS prefs ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " time_based INTEGER NOT NULL DEFAULT 0,"
+            " saved_at REAL"
+            ") WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS prefs_time_based ON prefs (key) WHERE time_based = 1")
+
+        self._pending = {}          # key → entry, or None for a pending delete
+        self._pending_since = None
+        self._cache = OrderedDict() # key → entry, or None for a known-missing key
+        self._lock = threading.RLock()
+
+    ### Rows ###
+    @staticmethod
+    def _to_row(key, entry):
+        return (key, json.dumps(entry.get("value"), separators=(",", ":")), int(bool(entry.get("time_based"))), entry.get("saved_at"))
+
+    @staticmethod
+    def _from_row(value, time_based, saved_at):
+        return {"value": json.loads(value), "time_based": bool(time_based), "saved_at": saved_at}
+
+    def _cache_put(self, key, entry):
+        self._cache[key] = entry
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    ### Writes ###
+    def _queue(self, key, entry):
+        with self._lock:
+            self._pending[key] = entry
+            self._cache_put(key, entry)
+            if self._pending_since is None:
+                self._pending_since = time.monotonic()
+            if len(self._pending) >= self.batch_size or time.monotonic() - self._pending_since >= self.max_delay:
+                self.flush()
+
+    def flush(self) -> int:
+        """Commit pending writes in one transaction. Returns how many were written."""
+        with self._lock:
+            if not self._pending:
+                return 0
+            upserts = [self._to_row(key, entry) for key, entry in self._pending.items() if entry is not None]
+            deletes = [(key,) for key, entry in self._pending.items() if entry is None]
+            self._conn.execute("BEGIN")
+            try:
+                if upserts:
+                    self._conn.executemany(
+                        "INSERT INTO prefs (key, value, time_based, saved_at) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT(key) DO UPDATE SET value=excluded.value, time_based=excluded.time_based, saved_at=excluded.saved_at",
+                        upserts,
+                    )
+                if deletes:
+                    self._conn.executemany("DELETE FROM prefs WHERE key = ?", deletes)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+            written = len(self._pending)
+            self._pending = {}
+            self._pending_since = None
+            return written
+
+    def replace_all(self, entries: dict):
+        """Swap the whole contents for `entries` in a single transaction (used when loading a snapshot)."""
+        with self._lock:
+            self._pending = {}
+            self._pending_since = None
+            self._cache.clear()
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute("DELETE FROM prefs")
+                self._conn.executemany(
+                    "INSERT INTO prefs (key, value, time_based, saved_at) VALUES (?, ?, ?, ?)",
+                    [self._to_row(key, entry) for key, entry in entries.items()],
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def snapshot(self) -> SQLiteSnapshot:
+        """Commit what's pending, then pin a consistent view that another thread can read at its own pace."""
+        with self._lock:
+            self.flush()
+            return SQLiteSnapshot(self.db_path)
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            self._conn.close()
+
+    ### Mapping API ###
+    def _lookup(self, key):
+        with self._lock:
+            if key in self._pending:
+                return self._pending[key]
+            cached = self._cache.get(key, _MISSING)
+            if cached is not _MISSING:
+                self._cache.move_to_end(key)
+                return cached
+
+            row = self._conn.execute(
+                "SELECT value, time_based, saved_at FROM prefs WHERE key = ?", (key,)
+            ).fetchone()
+            entry = self._from_row(*row) if row else None
+            self._cache_put(key, entry)
+            return entry
+
+    def __getitem__(self, key):
+        entry = self._lookup(key)
+        if entry is None:
+            raise KeyError(key)
+        return entry
+
+    def __setitem__(self, key, entry):
+        self._queue(key, entry)
+
+    def __delitem__(self, key):
+        if self._lookup(key) is None:
+            raise KeyError(key)
+        self._queue(key, None)
+
+    def __contains__(self, key):
+        return self._lookup(key) is not None
+
+    def __iter__(self):
+        return iter(self.keys_with_prefix(""))
+
+    def __len__(self):
+        with self._lock:
+            self.flush()
+            return self._conn.execute("SELECT COUNT(*) FROM prefs").fetchone()[0]
+
+    def time_based_items(self) -> list[tuple]:
+        """(key, entry) pairs for every time-based entry (served by a partial index)."""
+        with self._lock:
+            self.flush()
+            rows = self._conn.execute(
+                "SELECT key, value, time_based, saved_at FROM prefs WHERE time_based = 1"
+            ).fetchall()
+        return [(row[0], self._from_row(*row[1:])) for row in rows]
+
+    def keys_with_prefix(self, prefix: str) -> list[str]:
+        """All keys starting with `prefix`, in key order, via an index range scan."""
+        return [key for key, _ in self.items_with_prefix(prefix, keys_only=True)]
+
+    def items_with_prefix(self, prefix: str, keys_only: bool = False) -> list[tuple]:
+        """(key, entry) pairs for every key starting with `prefix`, in key order."""
+        with self._lock:
+            self.flush()
+            columns = "key" if keys_only else "key, value, time_based, saved_at"
+            if prefix:
+                rows = self._conn.execute(
+                    f"SELECT {columns} FROM prefs WHERE key >= ? AND key < ? ORDER BY key",
+                    (prefix, prefix + "\U0010ffff"),
+                ).fetchall()
+            else:
+                rows = self._conn.execute(f"SELECT {columns} FROM prefs ORDER BY key").fetchall()
+
+        if keys_only:
+            return [(row[0], None) for row in rows]
+        return [(row[0], self._from_row(*row[1:])) for row in rows]
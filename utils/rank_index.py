@@ -0,0 +1,142 @@
+import random
+
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key, levels: int):
+        self.key = key
+        self.next = [None] * levels
+        self.width = [1] * levels   # how many bottom-level steps each forward link skips
+
+class RankIndex:
+    """
+    Order-statistic index of (member → score), ranked by highest score first (ties by lowest member).
+    Backed by an indexable skiplist, so update, remove, rank lookup and slicing the top are all O(log n).
+
+    Example:
+        index = RankIndex()
+        index.update(111, 500)
+        index.update(222, 900)
+        index.rank(111)    # → 2
+        index.top(0, 10)   # → [(222, 900), (111, 500)]
+    """
+    MAX_LEVELS = 32
+
+    def __init__(self, items=None):
+        self._head = _Node(None, self.MAX_LEVELS)
+        self._levels = 1
+        self._scores = {}  # member → score currently in the list
+        if items:
+            for member, score in items:
+                self.update(member, score)
+
+    @staticmethod
+    def _key(member, score):
+        return (-score, member)
+
+    def _random_levels(self) -> int:
+        levels = 1
+        while levels < self.MAX_LEVELS and random.random() < 0.5:
+            levels += 1
+        return levels
+
+    def _insert(self, key):
+        levels = self._random_levels()
+        self._levels = max(self._levels, levels)
+        node = _Node(key, levels)
+
+        # Walk down recording, per level, the last node before `key` and its position
+        update = [self._head] * self._levels
+        positions = [0] * self._levels
+        current, position = self._head, 0
+        for level in reversed(range(self._levels)):
+            while current.next[level] is not None and current.next[level].key < key:
+                position += current.width[level]
+                current = current.next[level]
+            update[level] = current
+            positions[level] = position
+
+        for level in range(self._levels):
+            prev = update[level]
+            if level < levels:
+                node.next[level] = prev.next[level]
+                prev.next[level] = node
+                # The new node sits at position + 1; split the link it landed in
+                node.width[level] = prev.width[level] - (position - positions[level])
+                prev.width[level] = position - positions[level] + 1
+            else:
+                prev.width[level] += 1
+
+    def _remove(self, key):
+        current = self._head
+        update = [self._head] * self._levels
+        for level in reversed(range(self._levels)):
+            while current.next[level] is not None and current.next[level].key < key:
+                current = current.next[level]
+            update[level] = current
+
+        target = current.next[0]
+        if target is None or target.key != key:
+            raise KeyError(key)
+        for level in range(self._levels):
+            prev = update[level]
+            if prev.next[level] is target:
+                prev.width[level] += target.width[level] - 1
+                prev.next[level] = target.next[level]
+            else:
+                prev.width[level] -= 1
+
+    def update(self, member, score):
+        """Set a member's score (scores ≤ 0 take the member off the board)."""
+        old = self._scores.get(member)
+        if old == score:
+            return
+        if old is not None:
+            self._remove(self._key(member, old))
+            del self._scores[member]
+        if score > 0:
+            self._insert(self._key(member, score))
+            self._scores[member] = score
+
+    def remove(self, member):
+        self.update(member, 0)
+
+    def rank(self, member):
+        """1-based position of `member`, or None if they aren't on the board."""
+        score = self._scores.get(member)
+        if score is None:
+            return None
+        key = self._key(member, score)
+        current, position = self._head, 0
+        for level in reversed(range(self._levels)):
+            while current.next[level] is not None and current.next[level].key <= key:
+                position += current.width[level]
+                current = current.next[level]
+        return position
+
+    def score(self, member):
+        return self._scores.get(member)
+
+    def top(self, start: int = 0, count: int = 10) -> list[tuple]:
+        """(member, score) pairs for ranks start+1 … start+count."""
+        if start >= len(self._scores) or count <= 0:
+            return []
+        # Jump straight to position start + 1, then walk the bottom level
+        current, position = self._head, 0
+        for level in reversed(range(self._levels)):
+            while current.next[level] is not None and position + current.width[level] <= start + 1:
+                position += current.width[level]
+                current = current.next[level]
+
+        results = []
+        while current is not None and len(results) < count:
+            score, member = -current.key[0], current.key[1]
+            results.append((member, score))
+            current = current.next[0]
+        return results
+
+    def __len__(self):
+        return len(self._scores)
+
+    def __contains__(self, member):
+        return member in self._scores